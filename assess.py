@@ -1,9 +1,102 @@
-from typing import Union, IO, Dict, Any
-from textwrap import dedent
+from typing import Union, IO, Dict, Any, List, Tuple, Optional
 import json
+import re
+import threading
+import time
+from collections import OrderedDict
 
 from langchain.prompts import ChatPromptTemplate
-from util import initialize_model, timestamp, read_content
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain.output_parsers import PydanticOutputParser
+from entities import RequirementAssessment, RequirementVerdict
+from prompts import assessment_template, cached_assessment_template, resume_assessment_template
+from util import initialize_model, timestamp, read_content, content_hash
+from tracing import span, logger
+
+# providers only cache prompt prefixes of at least this many tokens
+PROMPT_CACHE_MIN_TOKENS = {
+    'claude-3-haiku-20240307': 2048
+}
+DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+# models without prompt caching
+PROMPT_CACHE_UNSUPPORTED = {'claude-3-sonnet-20240229'}
+
+
+def job_requirements(job_description: Union[Dict, Any]) -> List[Tuple[str, str]]:
+    """
+    Lists individual requirements from a parsed job description
+
+    Args:
+        job_description (dict or CompleteJobProfile): Parsed job description
+
+    Returns:
+        List[Tuple[str, str]]: (category, requirement text) for each mandatory qualification,
+            optional qualification and tool, in job description order
+    """
+    if hasattr(job_description, 'dict'):
+        job_description = job_description.dict()
+    requirements = []
+
+    for category in ['mandatory', 'optional']:
+        key = f"{category}_qualifications"
+        wrapper = job_description.get(key) or {}
+        for item in wrapper.get(key) or []:
+            text = (item or {}).get('qualification')
+            if text:
+                requirements.append((category, text.strip()))
+
+    wrapper = job_description.get('professional_experience_with_tools') or {}
+    for item in wrapper.get('professional_tool_experiences') or []:
+        item = item or {}
+        if not item.get('tool'):
+            continue
+        text = item['tool']
+        if item.get('version'):
+            text += f" {item['version']}"
+        if item.get('number_of_years'):
+            text += f", {item['number_of_years']}+ years"
+        if item.get('mandatory') is not None:
+            text += " (mandatory)" if item['mandatory'] else " (optional)"
+        requirements.append(('tool', text))
+
+    return requirements
+
+
+class VerdictCache:
+    """
+    Thread safe memo of requirement verdicts keyed by (model, resume hash, requirement text),
+    evicting the least recently used verdicts beyond max_size
+    """
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._verdicts: "OrderedDict[Tuple[str, str, str], RequirementVerdict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, resume_hash: str, requirement: str) -> Optional[RequirementVerdict]:
+        with self._lock:
+            key = (model, resume_hash, requirement)
+            if key not in self._verdicts:
+                return None
+            self._verdicts.move_to_end(key)
+            return self._verdicts[key]
+
+    def put(self, model: str, resume_hash: str, verdict: RequirementVerdict) -> None:
+        with self._lock:
+            key = (model, resume_hash, verdict.requirement)
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_size:
+                self._verdicts.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._verdicts.clear()
+
+    def __len__(self) -> int:
+        return len(self._verdicts)
+
+
+verdict_cache = VerdictCache()
 
 
 class AssessResume:
@@ -35,39 +128,14 @@ class AssessResume:
         Returns:
             ChatPromptTemplate: Chat prompt template configured to use resume and job description as template variables 
         """
-        return ChatPromptTemplate.from_messages(
-            messages=[
-                (
-                    "system", 
-                    dedent(
-                        """
-                        You are a highly skilled resume sourcer with extensive experience in screening candidates for technology roles within the high-tech industry. You are provided with key information from a candidate's resume and a job description in JSON format. Your task is to assess the suitability of the resume for the role using a carefully designed rubric.
-                        Data Format:
-                        - Job Description: Contains fields like job opportunity, required education, skills, certifications, mandatory and optional experience, and clearance requirements.
-                        - Resume Content: Includes candidate contact information, location, skills, professional experience, tools used, certifications, training, education, and clearance status.
-                        
-                        RESUME CONTENT: {resume_content}
-                        JOB DESCRIPTION CONTENT: {job_content}
-
-                        Scoring Rubric:
-                        1. Education: Score 5 if the candidate meets the education requirement, otherwise 0.
-                        2. Mandatory Experience: Calculate score as (number of requirements met / total requirements) * 10.
-                        3. Optional Experience: Calculate score as (number of optional items met / total optional items) * 5.
-                        4. Tools: Score as (number of tools met / total tools listed) * 5.
-                        5. Certifications: Score as (number of certifications met / total certifications listed) * 5.
-                        6. Clearance: Score 5 if the candidate meets the clearance requirement, otherwise 0.
-                        7. For categories not listed in the job description, assign the full score available for that category.
-                        8. Sum the scores and convert the total to a percentage of 35.
-                        9. If the information in the job description or resume is insufficient for a reliable assessment, note this in your summary.
-                        10. Provide a detailed analysis for each category, the score obtained, and a final summary of the candidate's match to the job requirements. For each line item within the category, provide your reasoning on how the candidate matches or otherwise. Highlight if any mandatory requirements are not met, as this will disqualify the candidate.
-                        11. Include your recommendation on whether to proceed with considering the candidate for the role.
-
-                        Note: Ensure all calculations and data handling are done accurately, taking into account the structured nature of JSON data inputs.
-                        """
-                    )
-                )
-            ]
-        )
+        return ChatPromptTemplate.from_messages(messages=[("system", resume_assessment_template)])
+
+
+    def model_id(self) -> str:
+        """
+        Returns the name of the model used for assessment
+        """
+        return getattr(self.model, 'model_name', None) or getattr(self.model, 'model', '')
 
 
     def assess(self):
@@ -85,6 +153,257 @@ class AssessResume:
             "job_content": self.job_content,
             "resume_content": self.resume_content
         }
-        response = chain.invoke(input=input)
+        with span("assess", model=self.model_id()) as current:
+            response = chain.invoke(input=input)
+            current.record_tokens(response)
         return response.content
 
+
+    def assess_requirements(self, job_description: Union[Dict, Any, None] = None, cache: VerdictCache = verdict_cache) -> List[RequirementVerdict]:
+        """
+        Assesses the resume against each requirement of the job description.
+
+        Verdicts are memoized by (model, resume hash, requirement text), so when the job description
+        changes only the added or changed requirements are sent to the LLM.
+
+        Args:
+            job_description (dict or CompleteJobProfile, optional): Updated parsed job description.
+                Defaults to the job description provided at initialization.
+            cache (VerdictCache, optional): Verdict memo. Defaults to the module level cache.
+
+        Returns:
+            List[RequirementVerdict]: One verdict per requirement, in job description order.
+                Requirements the LLM did not return a verdict for are marked with met=None.
+        """
+        if job_description is not None:
+            self.job_content = job_description
+        model = self.model_id()
+        resume_hash = content_hash(self.resume_content)
+        requirements = job_requirements(self.job_content)
+
+        found = dict((text, cache.get(model, resume_hash, text)) for category, text in requirements)
+        pending = [(category, text) for category, text in requirements if found[text] is None]
+        if pending:
+            for verdict in self._assess_pending(pending):
+                cache.put(model, resume_hash, verdict)
+                found[verdict.requirement] = verdict
+
+        verdicts = []
+        for category, text in requirements:
+            verdict = found[text]
+            if verdict is None:
+                verdict = RequirementVerdict(requirement=text, category=category, reasoning="not assessed")
+            verdicts.append(verdict)
+        return verdicts
+
+
+    def _assess_pending(self, pending: List[Tuple[str, str]]) -> List[RequirementVerdict]:
+        """
+        Requests verdicts for requirements not found in the cache
+
+        Args:
+            pending (List[Tuple[str, str]]): (category, requirement text) to assess
+
+        Returns:
+            List[RequirementVerdict]: Verdicts returned by the LLM for the pending requirements
+        """
+        parser = PydanticOutputParser(pydantic_object=RequirementAssessment)
+        prompt = ChatPromptTemplate.from_messages(
+            messages=[
+                ("system", assessment_template),
+                ("human", "Provide exactly one verdict per numbered requirement in JOB DESCRIPTION CONTENT. Put the requirement's number into the number field, its text into the requirement field and the bracketed label into the category field.")
+            ]
+        )
+        chain = prompt | self.model
+        input = {
+            "resume_content": self.resume_content,
+            "job_content": "\n".join(f"{number}. [{category}] {text}" for number, (category, text) in enumerate(pending, 1)),
+            "format_instructions": parser.get_format_instructions()
+        }
+        with span("assess_requirements", model=self.model_id(), requirements=len(pending)) as current:
+            message = chain.invoke(input=input)
+            current.record_tokens(message)
+            response = parser.parse(message.content)
+
+        # verdicts are matched by number, so paraphrased requirement text is not lost;
+        # the text is only a fallback for verdicts without a valid number
+        by_text = dict((text.lower(), number) for number, (category, text) in enumerate(pending, 1))
+        verdicts = {}
+        for verdict in response.verdicts:
+            number = verdict.number
+            if number is None or not 1 <= number <= len(pending):
+                number = by_text.get((verdict.requirement or "").strip().lower())
+            if number is None or number in verdicts:
+                logger.warning("ignoring verdict for unknown requirement: %s", verdict.requirement)
+                continue
+            category, text = pending[number - 1]
+            verdicts[number] = verdict.copy(update={'number': None, 'requirement': text, 'category': category})
+        return list(verdicts.values())
+
+
+def prompt_cache_usage(response: Any) -> Tuple[int, int]:
+    """
+    Reads input and prompt cache read token counts from an LLM response
+
+    Args:
+        response (AIMessage): Response from the LLM
+
+    Returns:
+        Tuple[int, int]: (input tokens, input tokens read from the provider's prompt cache)
+    """
+    metadata = getattr(response, 'response_metadata', None) or {}
+    usage = metadata.get('usage') or {}
+    if 'cache_read_input_tokens' in usage:  # anthropic
+        cached = usage.get('cache_read_input_tokens') or 0
+        total = (usage.get('input_tokens') or 0) + cached + (usage.get('cache_creation_input_tokens') or 0)
+        return total, cached
+    usage = metadata.get('token_usage') or {}
+    if usage:  # openai
+        details = usage.get('prompt_tokens_details') or {}
+        return usage.get('prompt_tokens') or 0, details.get('cached_tokens') or 0
+    return 0, 0
+
+
+class BatchAssessResume:
+    """
+    Assesses many resumes against one job description.
+
+    The rubric and job description form a stable system message prefix shared by every call, with
+    resumes following in the human message, so providers can serve the prefix from their prompt cache.
+    Providers only cache prefixes above a minimum length (1024 tokens, 2048 on Claude 3 Haiku), and the
+    rubric plus a compact job description is often shorter. The prefix is not padded to reach it; such
+    prefixes are reported as not cacheable and gain nothing over AssessResume apart from resume packing.
+    """
+    def __init__(self, job_description: Union[str, Dict], model_name: str, pack_size: int = 1):
+        """
+        Initializes BatchAssessResume
+
+        Args:
+            job_description (str or dict): Parsed job description
+            model_name (str): LLM model to use
+            pack_size (int, optional): Number of resumes assessed per LLM call. Defaults to 1.
+        """
+        self.job_content = job_description
+        self.model = initialize_model(model_name)
+        self.pack_size = max(1, pack_size)
+        self.prefix = cached_assessment_template.format(job_content=self.job_content)
+        # rough estimate, provider tokenizers differ
+        self.prefix_tokens = len(self.prefix) // 4
+        self.prefix_cacheable = self._prefix_cacheable()
+        if not self.prefix_cacheable:
+            logger.warning("prompt prefix of ~%s tokens will not be cached by %s", self.prefix_tokens, self.model_id())
+        self.system_message = self._create_system_message()
+        self.stats = {
+            "calls": 0,
+            "prefix_hits": 0,
+            "input_tokens": 0,
+            "cached_tokens": 0,
+            "candidate_latency": {}
+        }
+
+
+    def model_id(self) -> str:
+        """
+        Returns the name of the model used for assessment
+        """
+        return getattr(self.model, 'model_name', None) or getattr(self.model, 'model', '')
+
+
+    def _prefix_cacheable(self) -> bool:
+        """
+        Determines whether the model can cache the system message prefix
+
+        Returns:
+            bool: False if the model has no prompt caching or the prefix is below its minimum cacheable length
+        """
+        model = self.model_id()
+        if model in PROMPT_CACHE_UNSUPPORTED:
+            return False
+        return self.prefix_tokens >= PROMPT_CACHE_MIN_TOKENS.get(model, DEFAULT_PROMPT_CACHE_MIN_TOKENS)
+
+
+    def _create_system_message(self) -> SystemMessage:
+        """
+        Creates the cacheable system message holding the rubric and job description
+
+        Returns:
+            SystemMessage: System message, marked for prompt caching on Anthropic models that can cache it
+        """
+        if getattr(self.model, '_llm_type', '') == 'anthropic-chat' and self.prefix_cacheable:
+            return SystemMessage(content=[{"type": "text", "text": self.prefix, "cache_control": {"type": "ephemeral"}}])
+        # OpenAI caches identical prompt prefixes automatically
+        return SystemMessage(content=self.prefix)
+
+
+    def _split_response(self, content: str, candidate_ids: List[str]) -> Dict[str, str]:
+        """
+        Splits a packed response into per-candidate assessments
+
+        Args:
+            content (str): LLM response for a pack of resumes
+            candidate_ids (List[str]): Candidate ids in the pack
+
+        Returns:
+            Dict[str, str]: Assessment per candidate id
+        """
+        if len(candidate_ids) == 1:
+            return {candidate_ids[0]: content}
+        sections = re.split(r'^#+\s*CANDIDATE:\s*`?([^`\n]+?)`?\s*$', content, flags=re.MULTILINE)
+        found = dict((sections[i].strip(), sections[i + 1].strip()) for i in range(1, len(sections) - 1, 2))
+        return dict((cid, found.get(cid, "")) for cid in candidate_ids)
+
+
+    def assess_many(self, resumes: Dict[str, Union[str, Dict]]) -> Dict[str, str]:
+        """
+        Assesses each resume against the job description.
+
+        Args:
+            resumes (Dict[str, str or dict]): Parsed resume content per candidate id
+
+        Returns:
+            Dict[str, str]: Assessment per candidate id. Empty if the LLM omitted a candidate from a packed response.
+        """
+        candidate_ids = list(resumes)
+        assessments = {}
+        for start in range(0, len(candidate_ids), self.pack_size):
+            pack = candidate_ids[start:start + self.pack_size]
+            resume_text = "\n\n".join(f"CANDIDATE ID: {cid}\nRESUME CONTENT: {resumes[cid]}" for cid in pack)
+
+            started = time.perf_counter()
+            with span("assess_batch", model=self.model_id(), candidates=len(pack)) as current:
+                response = self.model.invoke([self.system_message, HumanMessage(content=resume_text)])
+                current.record_tokens(response)
+                input_tokens, cached_tokens = prompt_cache_usage(response)
+                current.set(cached_tokens=cached_tokens)
+            latency = time.perf_counter() - started
+
+            self.stats["calls"] += 1
+            self.stats["prefix_hits"] += 1 if cached_tokens else 0
+            self.stats["input_tokens"] += input_tokens
+            self.stats["cached_tokens"] += cached_tokens
+            for cid in pack:
+                self.stats["candidate_latency"][cid] = latency / len(pack)
+            assessments.update(self._split_response(response.content, pack))
+        return assessments
+
+
+    def report(self) -> Dict[str, float]:
+        """
+        Summarizes prompt cache effectiveness and latency
+
+        Returns:
+            Dict[str, float]: estimated prefix tokens and whether the model can cache them, prefix hit rate
+                (share of calls served with a cached prefix), cached token rate, and mean / max per-candidate
+                latency in seconds
+        """
+        stats = self.stats
+        latencies = list(stats["candidate_latency"].values())
+        return {
+            "prefix_tokens_estimate": self.prefix_tokens,
+            "prefix_cacheable": self.prefix_cacheable,
+            "calls": stats["calls"],
+            "prefix_hit_rate": stats["prefix_hits"] / stats["calls"] if stats["calls"] else 0.0,
+            "cached_token_rate": stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0,
+            "mean_candidate_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "max_candidate_latency": max(latencies) if latencies else 0.0
+        }
@@ -0,0 +1,130 @@
+"""
+Benchmarks the compact prompt encoding against the python repr of parsed documents.
+
+Usage:
+    python bench_encoding.py [--resume parsed_resume.json] [--jd parsed_jd.json] [--model gpt_35 --runs 3]
+
+Without --resume/--jd, synthetic documents are generated with faker. With --model, assessment
+latency is measured for both encodings using AssessResume.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Tuple
+
+from faker import Faker
+from entities import AllResumeContents, CompleteJobProfile
+from encode import compact_encode
+
+
+def count_tokens(text: str) -> Tuple[int, bool]:
+    """
+    Counts tokens using tiktoken's cl100k_base encoding, falling back to a 4 characters per token estimate
+    when tiktoken or its encoding file is unavailable
+
+    Args:
+        text (str): Text to count
+
+    Returns:
+        Tuple[int, bool]: Number of tokens, and whether it was counted rather than estimated
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return len(text) // 4, False
+    return len(encoding.encode(text)), True
+
+
+def synthetic_resume(fake: Faker) -> AllResumeContents:
+    tools = ["Java", "Python", "SQL", "Oracle", "Airflow", "Spark", "Kubernetes", "AWS", "Terraform"]
+    experiences = []
+    for year in range(2022, 2010, -3):
+        experiences.append({
+            "company": fake.company(),
+            "location": f"{fake.city()}, {fake.state_abbr()}, USA",
+            "role": fake.job(),
+            "start_year": str(year - 3),
+            "end_year": str(year),
+            "current_job": year == 2022,
+            "experience_detail": fake.paragraph(nb_sentences=6),
+            "tools_used": [{"tool_name": tool} for tool in random.sample(tools, 4)]
+        })
+    return AllResumeContents.parse_obj({
+        "candidate": {"fullname": fake.name(), "email": fake.email(), "phone": fake.phone_number(),
+                      "address": {"city": fake.city(), "state": fake.state_abbr()}},
+        "candidate_summary": {"summary": fake.paragraph(nb_sentences=4)},
+        "education": {"education": [{"school": fake.company() + " University", "degree": "BS", "specialization": "Computer Science", "year_graduated": "2008"}]},
+        "skills": {"category": "Technical", "skills": [{"skill": tool} for tool in tools]},
+        "experience": {"experiences": experiences},
+        "training": {"training": "Cloud Architecture", "year_completed": "2019"},
+        "certifications": {"Certitications": [{"certification_name": "AWS Solutions Architect", "year_certified": "2020"}]},
+        "overall_summary": {"summary": fake.paragraph(nb_sentences=8)}
+    })
+
+
+def synthetic_jd(fake: Faker) -> CompleteJobProfile:
+    return CompleteJobProfile.parse_obj({
+        "jobtitle": {"jobtitle": "Senior Data Engineer"},
+        "opportunity": {"opportunity": fake.paragraph(nb_sentences=4)},
+        "mandatory_qualifications": {"mandatory_qualifications": [{"qualification": fake.sentence()} for _ in range(6)]},
+        "optional_qualifications": {"optional_qualifications": [{"qualification": fake.sentence()} for _ in range(4)]},
+        "professional_experience_with_tools": {"professional_tool_experiences": [
+            {"tool": tool, "number_of_years": years, "mandatory": years > 3} for tool, years in [("Java", 5), ("SQL", 5), ("Airflow", 2)]
+        ]},
+        "clearance_requirement": {"clearance": "TS/SCI", "additional_attributes": "Polygraph"},
+        "job_description_summary": {"summary": fake.paragraph(nb_sentences=6)}
+    })
+
+
+def time_assessment(resume: str, jd: str, model_name: str, runs: int) -> float:
+    from assess import AssessResume
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        AssessResume(resume, jd, model_name=model_name).assess()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resume", help="JSON file with a parsed resume")
+    parser.add_argument("--jd", help="JSON file with a parsed job description")
+    parser.add_argument("--model", help="Model used to measure assessment latency, e.g. gpt_35")
+    parser.add_argument("--runs", type=int, default=3, help="Assessment runs per encoding")
+    args = parser.parse_args()
+
+    fake = Faker()
+    Faker.seed(0)
+    random.seed(0)
+    resume = AllResumeContents.parse_file(args.resume) if args.resume else synthetic_resume(fake)
+    jd = CompleteJobProfile.parse_file(args.jd) if args.jd else synthetic_jd(fake)
+
+    encodings = {
+        "repr": lambda obj: str(obj.dict()),
+        "compact": compact_encode
+    }
+    rows = []
+    for name, obj in [("resume", resume), ("jd", jd)]:
+        for encoding, encode in encodings.items():
+            text = encode(obj)
+            rows.append((name, encoding, len(text)) + count_tokens(text))
+    exact = all(row[4] for row in rows)
+    print(f"{'document':<10}{'encoding':<10}{'chars':>8}{'tokens' if exact else '~tokens':>8}")
+    for name, encoding, chars, tokens, _ in rows:
+        print(f"{name:<10}{encoding:<10}{chars:>8}{tokens:>8}")
+    if not exact:
+        print("~tokens: tiktoken unavailable, estimated as chars / 4")
+
+    if args.model:
+        print(f"\nmedian assessment latency ({args.runs} runs, {args.model})")
+        for encoding, encode in encodings.items():
+            latency = time_assessment(encode(resume), encode(jd), args.model, args.runs)
+            print(f"{encoding:<10}{latency:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
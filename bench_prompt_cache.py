@@ -0,0 +1,55 @@
+"""
+Measures prompt cache effectiveness and per-candidate latency of batch assessment.
+
+Usage:
+    python bench_prompt_cache.py --model gpt_4o [--jd parsed_jd.json] [--resumes a.json b.json] [--candidates 10] [--pack-size 1]
+
+Without --jd/--resumes, synthetic documents are generated with faker. Every resume is assessed
+against the job description with BatchAssessResume, which sends the rubric and job description
+as a stable prefix, and the hit rate and latency from BatchAssessResume.report are printed.
+"""
+import argparse
+import json
+import random
+
+from faker import Faker
+from entities import AllResumeContents, CompleteJobProfile
+from encode import compact_encode
+from bench_encoding import synthetic_resume, synthetic_jd
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Model used for assessment, e.g. gpt_4o or haiku")
+    parser.add_argument("--jd", help="JSON file with a parsed job description")
+    parser.add_argument("--resumes", nargs="*", default=[], help="JSON files with parsed resumes")
+    parser.add_argument("--candidates", type=int, default=10, help="Number of synthetic resumes when --resumes is not given")
+    parser.add_argument("--pack-size", type=int, default=1, help="Resumes assessed per LLM call")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    from assess import BatchAssessResume
+
+    fake = Faker()
+    Faker.seed(0)
+    random.seed(0)
+    jd = CompleteJobProfile.parse_file(args.jd) if args.jd else synthetic_jd(fake)
+    if args.resumes:
+        resumes = dict((path, AllResumeContents.parse_file(path)) for path in args.resumes)
+    else:
+        resumes = dict((f"candidate-{i}", synthetic_resume(fake)) for i in range(args.candidates))
+
+    batch = BatchAssessResume(compact_encode(jd), model_name=args.model, pack_size=args.pack_size)
+    assessments = batch.assess_many(dict((cid, compact_encode(resume)) for cid, resume in resumes.items()))
+    report = batch.report()
+    report["missing_assessments"] = sum(1 for text in assessments.values() if not text)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:<26}{round(value, 3) if isinstance(value, float) else value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Measures cold import time and memory of the modules ui.py loads, and fails if startup regresses.
+
+Usage:
+    python bench_startup.py [--runs 5] [--tolerance 0.2]
+    python bench_startup.py --update-baseline
+
+Each run imports the modules in a fresh interpreter with `python -X importtime`. The benchmark
+exits with status 1 if the median import time or peak RSS exceeds the committed baseline in
+bench_startup_baseline.json by more than the tolerance, or if a provider SDK or document loader
+is imported eagerly. --max-import-ms / --max-rss-mb replace the baseline with absolute budgets.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_startup_baseline.json")
+
+MODULES = ["util", "prompts", "encode", "entities", "checkpoints", "assess", "extract_data", "pipeline"]
+
+# must only be imported on first use, for the model or loader actually selected
+LAZY_MODULES = [
+    "langchain_openai", "langchain_anthropic", "langchain_groq", "pdf2docx", "pdfminer",
+    "unstructured", "langchain_community.document_loaders"
+]
+
+PROBE = """
+import json, resource, sys
+{imports}
+print(json.dumps({{
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "eager": [name for name in {lazy!r} if name in sys.modules]
+}}))
+"""
+
+
+def measure(modules):
+    """
+    Imports modules in a fresh interpreter
+
+    Args:
+        modules (List[str]): Modules to import
+
+    Returns:
+        Tuple[float, float, List[str]]: import time in ms, peak RSS in MB, lazy modules imported eagerly
+    """
+    code = PROBE.format(imports="\n".join(f"import {m}" for m in modules), lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # top level imports only, nested ones are in their cumulative time
+            total_us += int(cumulative)
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    # ru_maxrss is reported in KB on linux
+    return total_us / 1000, probe["rss_kb"] / 1024, probe["eager"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts to measure")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression over the baseline, 0.2 for +20%%")
+    parser.add_argument("--max-import-ms", type=float, help="Budget for the median import time, instead of the baseline")
+    parser.add_argument("--max-rss-mb", type=float, help="Budget for the median peak RSS, instead of the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the measurements to the baseline file")
+    args = parser.parse_args()
+
+    baseline = [measure([]) for _ in range(args.runs)]
+    runs = [measure(MODULES) for _ in range(args.runs)]
+    import_ms = statistics.median(run[0] for run in runs)
+    rss_mb = statistics.median(run[1] for run in runs)
+    baseline_rss_mb = statistics.median(run[1] for run in baseline)
+    eager = sorted(set(name for run in runs for name in run[2]))
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump({"import_ms": round(import_ms, 1), "rss_mb": round(rss_mb, 1)}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {BASELINE_FILE}: {import_ms:.1f} ms, {rss_mb:.1f} MB")
+        return
+
+    max_import_ms, max_rss_mb = args.max_import_ms, args.max_rss_mb
+    if max_import_ms is None or max_rss_mb is None:
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+        if max_import_ms is None:
+            max_import_ms = baseline["import_ms"] * (1 + args.tolerance)
+        if max_rss_mb is None:
+            max_rss_mb = baseline["rss_mb"] * (1 + args.tolerance)
+
+    print(f"modules:        {', '.join(MODULES)}")
+    print(f"import time:    {import_ms:8.1f} ms (budget {max_import_ms:.0f} ms)")
+    print(f"peak rss:       {rss_mb:8.1f} MB (budget {max_rss_mb:.0f} MB, bare interpreter {baseline_rss_mb:.1f} MB)")
+    print(f"eager imports:  {', '.join(eager) or 'none'}")
+
+    failures = []
+    if import_ms > max_import_ms:
+        failures.append("import time over budget")
+    if rss_mb > max_rss_mb:
+        failures.append("peak rss over budget")
+    if eager:
+        failures.append("modules imported eagerly: " + ", ".join(eager))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Durable checkpoints for extraction workflows.
+
+Usage:
+    python checkpoints.py list [--status running]
+    python checkpoints.py cleanup --older-than-hours 24
+"""
+from typing import List, Dict, Any, Optional
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_CHECKPOINT_DB = "data/checkpoints.sqlite"
+# a run still marked running after this long is assumed to have died with its process
+RUN_STALE_SECONDS = 600
+
+
+class CheckpointStore:
+    """
+    Local SQLite store holding workflow checkpoints and a registry of extraction runs
+    """
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_DB):
+        """
+        Initializes CheckpointStore
+
+        Args:
+            path (str, optional): SQLite database file. Defaults to DEFAULT_CHECKPOINT_DB.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extraction_runs (
+                    run_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+        self.saver = SqliteSaver(self.conn)
+
+
+    def start(self, run_id: str) -> None:
+        """
+        Registers a run, or marks an existing run as running again when resumed
+
+        Args:
+            run_id (str): Run id, used as the workflow thread id
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO extraction_runs VALUES (?, 'running', ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at",
+                (run_id, now, now)
+            )
+
+
+    def claim(self, run_id: str) -> bool:
+        """
+        Registers a run as running unless another session is running it
+
+        Args:
+            run_id (str): Run id, used as the workflow thread id
+
+        Returns:
+            bool: True if the run was claimed, False if it is running elsewhere and not stale
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO extraction_runs VALUES (?, 'running', ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at "
+                "WHERE extraction_runs.status != 'running' OR extraction_runs.updated_at < ?",
+                (run_id, now, now, now - RUN_STALE_SECONDS)
+            )
+        return cursor.rowcount == 1
+
+
+    def wait_and_claim(self, run_id: str, timeout: Optional[float] = None, poll_interval: float = 0.5) -> bool:
+        """
+        Claims a run, waiting while another session is running it
+
+        Args:
+            run_id (str): Run id
+            timeout (float, optional): Seconds to wait. Defaults to RUN_STALE_SECONDS.
+            poll_interval (float, optional): Seconds between attempts. Defaults to 0.5.
+
+        Returns:
+            bool: True if the run was claimed, False if the wait timed out
+        """
+        give_up = time.time() + (RUN_STALE_SECONDS if timeout is None else timeout)
+        while not self.claim(run_id):
+            if time.time() >= give_up:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+
+    def finish(self, run_id: str, status: str = "completed") -> None:
+        """
+        Records the final status of a run
+
+        Args:
+            run_id (str): Run id
+            status (str, optional): 'completed' or 'failed'. Defaults to 'completed'.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE extraction_runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id)
+            )
+
+
+    def list_runs(self, status: Optional[str] = None, older_than: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Lists registered runs
+
+        Args:
+            status (str, optional): Only runs with this status
+            older_than (float, optional): Only runs not updated for this many seconds
+
+        Returns:
+            List[Dict[str, Any]]: run_id, status, created_at and updated_at per run, oldest first
+        """
+        query = "SELECT run_id, status, created_at, updated_at FROM extraction_runs WHERE 1 = 1"
+        params = []
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        if older_than is not None:
+            query += " AND updated_at < ?"
+            params.append(time.time() - older_than)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY updated_at", params).fetchall()
+        return [dict(zip(["run_id", "status", "created_at", "updated_at"], row)) for row in rows]
+
+
+    def delete(self, run_id: str) -> None:
+        """
+        Deletes a run and its checkpoints
+
+        Args:
+            run_id (str): Run id
+        """
+        with self.lock, self.conn:
+            tables = [row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            for table in ["checkpoints", "writes"]:
+                if table in tables:
+                    self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (run_id,))
+            self.conn.execute("DELETE FROM extraction_runs WHERE run_id = ?", (run_id,))
+
+
+    def cleanup(self, older_than: float, status: Optional[str] = None) -> List[str]:
+        """
+        Deletes stale runs and their checkpoints
+
+        Args:
+            older_than (float): Delete runs not updated for this many seconds
+            status (str, optional): Only delete runs with this status
+
+        Returns:
+            List[str]: Deleted run ids
+        """
+        run_ids = [run["run_id"] for run in self.list_runs(status=status, older_than=older_than)]
+        for run_id in run_ids:
+            self.delete(run_id)
+        return run_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["list", "cleanup"])
+    parser.add_argument("--db", default=DEFAULT_CHECKPOINT_DB, help="Checkpoint database")
+    parser.add_argument("--status", help="Only runs with this status: running, completed or failed")
+    parser.add_argument("--older-than-hours", type=float, default=None, help="Only runs not updated for this many hours")
+    args = parser.parse_args()
+
+    store = CheckpointStore(args.db)
+    older_than = args.older_than_hours * 3600 if args.older_than_hours is not None else None
+    if args.command == "list":
+        for run in store.list_runs(status=args.status, older_than=older_than):
+            updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["updated_at"]))
+            print(f"{run['run_id']}\t{run['status']}\t{updated}")
+    else:
+        if older_than is None:
+            parser.error("cleanup requires --older-than-hours")
+        for run_id in store.cleanup(older_than, status=args.status):
+            print(f"deleted {run_id}")
+
+
+if __name__ == "__main__":
+    main()
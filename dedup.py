@@ -0,0 +1,259 @@
+"""
+Near-duplicate document detection with MinHash signatures and LSH banding.
+
+Documents are normalized and split into word shingles; a MinHash signature estimates the
+Jaccard similarity between the shingle sets. Signatures are split into bands and each band
+is hashed into a bucket, so candidate duplicates are found with indexed bucket lookups
+instead of comparing against every stored document. The index is kept in SQLite together
+with the parsed object of each document, so an identical document can reuse it instead of
+going through extraction again, and a near-duplicate can be diffed against the earlier one.
+"""
+from typing import List, Optional, Tuple
+from collections import namedtuple
+import difflib
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import os
+
+import numpy as np
+
+DEFAULT_DEDUP_DB = "data/dedup.sqlite"
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+Match = namedtuple('Match', ['doc_id', 'similarity', 'parsed'])
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes document text so formatting changes do not affect the fingerprint
+
+    Args:
+        text (str): Document text
+
+    Returns:
+        str: Lower case words separated by single spaces, without punctuation
+    """
+    return " ".join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """
+    Splits normalized text into overlapping word shingles
+
+    Args:
+        text (str): Normalized text
+        size (int, optional): Words per shingle. Defaults to 3.
+
+    Returns:
+        List[str]: Shingles, or the whole text if it is shorter than one shingle
+    """
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Chooses the number of bands and rows per band for a similarity threshold
+
+    Args:
+        threshold (float): Jaccard similarity threshold
+        num_perm (int): Signature length
+
+    Returns:
+        Tuple[int, int]: (bands, rows) with bands * rows <= num_perm, whose S-curve midpoint
+            (1 / bands) ** (1 / rows) is closest to the threshold
+    """
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1)]
+    return min(candidates, key=lambda p: abs((1 / p[0]) ** (1 / p[1]) - threshold))
+
+
+class MinHasher:
+    """Computes MinHash signatures with a fixed set of random permutations"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Computes the MinHash signature of a document
+
+        Args:
+            text (str): Document text
+
+        Returns:
+            np.ndarray: uint64 signature of length num_perm
+        """
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in set(shingles(normalize_text(text)))],
+            dtype=np.uint64
+        )
+        # (a * h + b) mod p stays below 2**64 since a, b and h are 32 bit values
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimates Jaccard similarity from two MinHash signatures"""
+    return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    """
+    Persistent LSH index of document signatures and their parsed objects
+    """
+    def __init__(self, path: str = DEFAULT_DEDUP_DB, threshold: float = 0.85, num_perm: int = 128):
+        """
+        Initializes DuplicateIndex
+
+        Args:
+            path (str, optional): SQLite database file. Defaults to DEFAULT_DEDUP_DB.
+            threshold (float, optional): Minimum estimated Jaccard similarity of a near-duplicate. Defaults to 0.85.
+            num_perm (int, optional): Signature length. Defaults to 128. Changing it requires a new index.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    content_type TEXT,
+                    signature BLOB NOT NULL,
+                    text BLOB NOT NULL,
+                    parsed TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS buckets (
+                    rows INTEGER NOT NULL,
+                    band INTEGER NOT NULL,
+                    bucket TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    PRIMARY KEY (rows, band, bucket, doc_id)
+                ) WITHOUT ROWID
+                """
+            )
+
+
+    def _buckets(self, signature: np.ndarray) -> List[Tuple[int, int, str]]:
+        return [
+            (self.rows, band, hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest())
+            for band in range(self.bands)
+        ]
+
+
+    def add(self, doc_id: str, text: str, content_type: Optional[str] = None, parsed: Optional[str] = None) -> None:
+        """
+        Adds a document to the index, replacing an existing entry with the same id
+
+        Args:
+            doc_id (str): Document id
+            text (str): Document text
+            content_type (str, optional): e.g. 'resume' or 'jd'; near-duplicates only match the same type
+            parsed (str, optional): JSON of the parsed object
+        """
+        signature = self.hasher.signature(text)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, content_type, signature.tobytes(), zlib.compress(text.encode('utf-8')), parsed, time.time())
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?)",
+                [bucket + (doc_id,) for bucket in self._buckets(signature)]
+            )
+
+
+    def set_parsed(self, doc_id: str, parsed: str) -> None:
+        """
+        Stores the parsed object of an indexed document
+
+        Args:
+            doc_id (str): Document id
+            parsed (str): JSON of the parsed object
+        """
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE documents SET parsed = ? WHERE doc_id = ?", (parsed, doc_id))
+
+
+    def query(self, text: str, content_type: Optional[str] = None) -> List[Match]:
+        """
+        Finds near-duplicates of a document
+
+        Args:
+            text (str): Document text
+            content_type (str, optional): Only match documents of this type
+
+        Returns:
+            List[Match]: Documents with estimated similarity at or above the threshold, most similar first
+        """
+        signature = self.hasher.signature(text)
+        buckets = self._buckets(signature)
+        clauses = " OR ".join(["(b.rows = ? AND b.band = ? AND b.bucket = ?)"] * len(buckets))
+        params = [value for bucket in buckets for value in bucket]
+        query = f"SELECT DISTINCT d.doc_id, d.signature, d.parsed FROM buckets b JOIN documents d ON d.doc_id = b.doc_id WHERE ({clauses})"
+        if content_type is not None:
+            query += " AND d.content_type = ?"
+            params.append(content_type)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        matches = []
+        for doc_id, stored, parsed in rows:
+            score = similarity(signature, np.frombuffer(stored, dtype=np.uint64))
+            if score >= self.threshold:
+                matches.append(Match(doc_id, score, parsed))
+        return sorted(matches, key=lambda m: m.similarity, reverse=True)
+
+
+    def find_duplicate(self, text: str, content_type: Optional[str] = None) -> Optional[Match]:
+        """
+        Finds the most similar already parsed near-duplicate of a document
+
+        Args:
+            text (str): Document text
+            content_type (str, optional): Only match documents of this type
+
+        Returns:
+            Match: Best match with a parsed object, None if there is none
+        """
+        return next((m for m in self.query(text, content_type) if m.parsed), None)
+
+
+    def diff(self, doc_id: str, text: str) -> List[str]:
+        """
+        Diffs a document against an indexed one
+
+        Args:
+            doc_id (str): Indexed document id
+            text (str): Document text
+
+        Returns:
+            List[str]: Unified diff lines, empty if the document is not indexed or the texts are equal
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT text FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return []
+        stored = zlib.decompress(row[0]).decode('utf-8')
+        return list(difflib.unified_diff(stored.splitlines(), text.splitlines(), fromfile=doc_id, tofile="new", lineterm=""))
@@ -0,0 +1,111 @@
+from typing import Any, List
+import re
+
+from langchain.pydantic_v1 import BaseModel
+
+
+def prune(value: Any) -> Any:
+    """
+    Converts parsed content to plain python values, dropping nulls and flattening single-field wrappers
+
+    Args:
+        value (Any): Pydantic object, dict, list or scalar
+
+    Returns:
+        Any: Pruned value, None if nothing is left
+    """
+    if isinstance(value, BaseModel):
+        fields = list(type(value).__fields__)
+        if len(fields) == 1:  # wrapper such as Education.education or Skill.skill
+            return prune(getattr(value, fields[0]))
+        value = dict((field, getattr(value, field)) for field in fields)
+    if isinstance(value, dict):
+        pruned = dict((key, prune(item)) for key, item in value.items())
+        pruned = dict((key, item) for key, item in pruned.items() if item is not None)
+        return pruned or None
+    if isinstance(value, (list, tuple)):
+        pruned = [item for item in (prune(item) for item in value) if item is not None]
+        return pruned or None
+    if isinstance(value, str):
+        value = re.sub(r'\s+', ' ', value).strip()
+        return value or None
+    return value
+
+
+def _scalar(value: Any) -> str:
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return str(value)
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list))
+
+
+def _inline(items: List[Any]) -> bool:
+    """Short lists of scalars without separators are written on one line"""
+    if not all(_is_scalar(item) for item in items):
+        return False
+    text = [_scalar(item) for item in items]
+    return sum(len(t) for t in text) <= 120 and not any("," in t or ";" in t for t in text)
+
+
+def _lines(value: Any, indent: int) -> List[str]:
+    """
+    Renders a pruned value as indented lines
+
+    Args:
+        value (Any): Pruned value
+        indent (int): Indentation level
+
+    Returns:
+        List[str]: Rendered lines
+    """
+    pad = " " * indent
+    lines = []
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if _is_scalar(item):
+                lines.append(f"{pad}{key}: {_scalar(item)}")
+            elif isinstance(item, list) and _inline(item):
+                lines.append(f"{pad}{key}: {', '.join(_scalar(i) for i in item)}")
+            else:
+                lines.append(f"{pad}{key}:")
+                lines.extend(_lines(item, indent + 1))
+    elif isinstance(value, list):
+        for item in value:
+            if _is_scalar(item):
+                lines.append(f"{pad}- {_scalar(item)}")
+                continue
+            if isinstance(item, list):
+                lines.append(f"{pad}-")
+                lines.extend(_lines(item, indent + 1))
+                continue
+            # fields joined with "; " on the item line must not contain ";" or ": " themselves
+            flat = dict((k, v) for k, v in item.items() if _is_scalar(v) and ";" not in _scalar(v) and ": " not in _scalar(v))
+            nested = dict((k, v) for k, v in item.items() if k not in flat)
+            lines.append(f"{pad}- " + "; ".join(f"{k}: {_scalar(v)}" for k, v in flat.items()) if flat else f"{pad}-")
+            lines.extend(_lines(nested, indent + 1))
+    else:
+        lines.append(f"{pad}{_scalar(value)}")
+    return lines
+
+
+def compact_encode(content: Any) -> str:
+    """
+    Encodes parsed content (e.g. AllResumeContents or CompleteJobProfile) in a terse line oriented format for prompts.
+
+    Null and empty fields are dropped, single-field wrappers are flattened, nesting is shown by
+    one space of indentation and list items of scalar fields are written on one line, apart from
+    fields containing separators, which get a line of their own.
+
+    Args:
+        content (BaseModel or dict): Parsed content
+
+    Returns:
+        str: Encoded content
+    """
+    pruned = prune(content)
+    if pruned is None:
+        return ""
+    return "\n".join(_lines(pruned, 0))
@@ -8,3 +8,17 @@ class ReflectionOuput(BaseModel):
     recommendations: str = Field(default="n/a", description="Actionable recommendations formatted as a bulleted list for making necessary changes to align with original formatting instructions and improvement if needed for any attribute. Use examples as needed.")
     feedback: str = Field(default="n/a", description="'perfect' if no changes are required, or 'needs work' otherwise")
 
+
+class RequirementVerdict(BaseModel):
+    """Verdict on whether the candidate meets a single job requirement"""
+    number: Optional[int] = Field(default=None, description="Number of the requirement in the job description content")
+    requirement: str = Field(description="Requirement text exactly as provided in the job description content")
+    category: Optional[str] = Field(default=None, description="Requirement category: 'mandatory', 'optional' or 'tool'")
+    met: Optional[bool] = Field(default=None, description="True if the candidate meets the requirement, False otherwise")
+    evidence: Optional[str] = Field(default=None, description="Evidence from the resume supporting the verdict")
+    reasoning: Optional[str] = Field(default=None, description="Reasoning on how the candidate matches the requirement or otherwise")
+
+
+class RequirementAssessment(BaseModel):
+    """List of verdicts, one per requirement listed in the job description content"""
+    verdicts: List[RequirementVerdict] = Field(default_factory=list, description="One verdict per requirement")
@@ -1,31 +1,49 @@
 import operator
 import re
 import json
+import hashlib
+import time
+from collections import namedtuple
 from typing import TypedDict, List, Annotated, Sequence, Dict, Any, Union
 from langchain_core.messages import BaseMessage, HumanMessage
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from entities import ReflectionOuput
+from checkpoints import CheckpointStore, DEFAULT_CHECKPOINT_DB
+from tracing import span, logger, token_usage
+from encode import prune
+
+
+ExtractionResult = namedtuple('ExtractionResult', ['parsed_object', 'report'])
+
+# with a deadline, failed LLM calls are retried at most this often and only while this much time is left
+MAX_RETRIES = 2
+MIN_RETRY_SECONDS = 5.0
 
 
 class AgentState(TypedDict):
     text: str
-    pydantic_class: BaseModel
     messages: Annotated[Sequence[BaseMessage], operator.add]
     num_validation_attempts: int
     parsed_object: BaseModel
     validation_status: str
     max_validation_attempts: int
     reflection_status: str
+    deadline: Union[float, None]
+    token_budget: Union[int, None]
+    tokens_used: int
+    round_seconds: Dict[str, float]
+    round_tokens: Dict[str, int]
+    timed_out: bool
+    partial_fields: Dict[str, Any]
 
 
 class InformationExtractor:
     """A class for extracting information from text using LLMs"""
 
-    def __init__(self, pydantic_class: BaseModel, max_validation_attempts: int = 5):
+    def __init__(self, pydantic_class: BaseModel, max_validation_attempts: int = 5, checkpoint_db: Union[str, None] = DEFAULT_CHECKPOINT_DB):
         """
         Initializes the InformationExtractor.
 
@@ -34,9 +52,13 @@ class InformationExtractor:
                 class that defines elements and the structure of the information to be extracted
             max_validation_attempts (int, optional): 
                 maximum number of validation attempts allowed. Defaults to 5.
+            checkpoint_db (str, optional):
+                SQLite file where workflow state is checkpointed after each node. None disables checkpointing.
+                Defaults to DEFAULT_CHECKPOINT_DB.
         """
         self.pydantic_class = pydantic_class
         self.max_validation_attempts = max_validation_attempts
+        self.checkpoints = CheckpointStore(checkpoint_db) if checkpoint_db else None
         self.wf = self._build_workflow()
 
     def _build_workflow(self) -> StateGraph:
@@ -71,7 +93,9 @@ class InformationExtractor:
             }
         )
         g.set_entry_point("prompt")
-        return g.compile()
+        if self.checkpoints is None:
+            return g.compile()
+        return g.compile(checkpointer=self.checkpoints.saver)
     
 
     def _invoke_prompt(self, state: AgentState) -> Dict[str, Any]:
@@ -84,19 +108,19 @@ class InformationExtractor:
         Returns:
             Dict[str, Any]: dictionary containing the updated state.
         """
-        print("** invoke_prompt **")
-        parser = PydanticOutputParser(pydantic_object=state['pydantic_class'])
-        template = ChatPromptTemplate.from_messages(
-            messages=[
-                ("system", "You are provided with TEXT. Your task is to extract information from TEXT and format as per FORMAT_INSTRUCTIONS provided."),
-                ("human", "TEXT:\n\n{text}\n\n FORMAT_INSTRUCTIONS: {format_instructions}\nMake sure to process each item as per the instruction. Pay special attention to the nested structures and ensure your formatting follows instructions 100%.")
-            ]
-        )
-        input = {
-            'text': state['text'],
-            'format_instructions': parser.get_format_instructions()
-        }
-        response = template.invoke(input=input)
+        with span("invoke_prompt", pydantic_class=self.pydantic_class.__name__):
+            parser = PydanticOutputParser(pydantic_object=self.pydantic_class)
+            template = ChatPromptTemplate.from_messages(
+                messages=[
+                    ("system", "You are provided with TEXT. Your task is to extract information from TEXT and format as per FORMAT_INSTRUCTIONS provided."),
+                    ("human", "TEXT:\n\n{text}\n\n FORMAT_INSTRUCTIONS: {format_instructions}\nMake sure to process each item as per the instruction. Pay special attention to the nested structures and ensure your formatting follows instructions 100%.")
+                ]
+            )
+            input = {
+                'text': state['text'],
+                'format_instructions': parser.get_format_instructions()
+            }
+            response = template.invoke(input=input)
         return {"messages": response.messages, "validation_status": "fail", "num_validation_attempts": 0, "reflection_status": "n/a"}
 
 
@@ -111,19 +135,22 @@ class InformationExtractor:
             Dict[str, Any]: dictionary containing the updated state.
         """
         num_validation_attempts = state['num_validation_attempts'] + 1
-        print(f"** generate ATTEMPT #: {num_validation_attempts} **")
-        reflection_status = state["reflection_status"]
-        validation_status = state["validation_status"]
-
-        print(f"validation_status: {validation_status}")
-        print(f"reflection_status: {reflection_status}")
-
         messages = state['messages']
         # llm = AzureChatOpenAI(model="gpt-3.5-turbo-0613", api_version="2024-03-01-preview", azure_deployment="sa001gpt35turbo0613", temperature=0.0)
         # llm = ChatOpenAI(model="gpt-4-0125-preview", temperature=0)
-        llm = ChatOpenAI(model="gpt-3.5-turbo-0125", temperature=0)
-        response = llm.invoke(messages)
-        return {"messages": [response], "num_validation_attempts": num_validation_attempts}
+        model = "gpt-3.5-turbo-0125"
+        started = time.time()
+        with span("generate", model=model, attempt=num_validation_attempts,
+                  validation_status=state["validation_status"], reflection_status=state["reflection_status"]) as current:
+            try:
+                response = self._invoke_llm(state, model, messages)
+            except Exception:
+                if not self._out_of_time(state, "generate"):
+                    raise
+                current.set(outcome="timeout")
+                return {"num_validation_attempts": num_validation_attempts, "timed_out": True}
+            current.record_tokens(response)
+        return {"messages": [response], "num_validation_attempts": num_validation_attempts, **self._usage(state, "generate", response, started)}
 
     
     def _extract_json_content(self, text):
@@ -135,7 +162,7 @@ class InformationExtractor:
             # Return the first non-None group that captures the desired content
              json_text = next((m for m in match.groups() if m is not None), None)
         if not json_text:
-            print(f"json extraction failed for text:\n{text}")
+            logger.warning("json extraction failed for text:\n%s", text)
             raise ValueError
         return json_text
 
@@ -150,30 +177,53 @@ class InformationExtractor:
         Returns:
             Dict[str, Any]: dictionary containing the updated state.
         """
-        print("** validate **")
         last_message = state['messages'][-1]
-        num_validation_attempts = state['num_validation_attempts']
         reflection_status = state["reflection_status"]
-        validation_status = state["validation_status"]
+        if state.get("timed_out"):
+            # generate ran out of time, there is no new response to validate
+            return {"reflection_status": reflection_status}
+
+        with span("validate", attempt=state['num_validation_attempts']) as current:
+            json_text = None
+            try:
+                json_text = self._extract_json_content(last_message.content)
+                logger.debug("json_text:\n%s", json_text)
+                obj = self.pydantic_class(**json.loads(json_text))
+            except Exception as e:
+                logger.info("validation failed: %s", e)
+                current.set(outcome="fail", error=type(e).__name__)
+                message = HumanMessage(f"Error parsing JSON: {e}\n Address these errors.")
+                partial_fields = dict(state.get("partial_fields") or {})
+                partial_fields.update(self._valid_fields(json_text))
+                return {'messages': [message], "validation_status": "fail", "reflection_status": reflection_status, "partial_fields": partial_fields}
+            current.set(outcome="pass")
+        return {'validation_status': "pass", 'parsed_object': obj}
 
-        print(f"num_validation_attempts: {num_validation_attempts}")
-        print(f"validation_status: {validation_status}")
-        print(f"reflection_status: {reflection_status}")
 
+    def _valid_fields(self, json_text: Union[str, None]) -> Dict[str, Any]:
+        """
+        Validates each top-level field of a response that failed validation as a whole.
+
+        Args:
+            json_text (str): JSON extracted from the LLM response.
+
+        Returns:
+            Dict[str, Any]: top-level fields that pass validation on their own.
+        """
         try:
-            # print(f"last_message.content:\n{last_message.content}")
-            # json_text = re.findall(r'```json\s*(.*)```', last_message.content, re.DOTALL)[0]
-            # print(f"json_text: \n{json_text}")
-            # obj = state['pydantic_class'](**json.loads(json_text))
-            
-            json_text = self._extract_json_content(last_message.content)
-            print(f"json_text:\n{json_text}")
-            obj = state['pydantic_class'](**json.loads(json_text))
-        except Exception as e:
-            print(e)
-            message = HumanMessage(f"Error parsing JSON: {e}\n Address these errors.")
-            return {'messages': [message], "validation_status": "fail", "reflection_status": reflection_status}
-        return {'validation_status': "pass", 'parsed_object': obj}
+            data = json.loads(json_text)
+        except Exception:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        fields = {}
+        for name, field in self.pydantic_class.__fields__.items():
+            if data.get(name) is None:
+                continue
+            value, errors = field.validate(data[name], {}, loc=name, cls=self.pydantic_class)
+            if not errors:
+                fields[name] = value
+        return fields
 
 
     def _reflect(self, state: AgentState) -> Dict[str, Any]:
@@ -186,18 +236,10 @@ class InformationExtractor:
         Returns:
             Dict[str, Any]: dictionary containing the updated state.
         """
-        print("** reflect **")
         messages = state['messages']
-        num_validation_attempts = state['num_validation_attempts']
-        reflection_status = state["reflection_status"]
-        validation_status = state["validation_status"]
-
-        print(f"num_validation_attempts: {num_validation_attempts}")
-        print(f"validation_status: {validation_status}")
-        print(f"reflection_status: {reflection_status}")
 
-        # reflect_llm = ChatOpenAI(model="gpt-4-0125-preview", temperature=0)
-        reflect_llm = ChatOpenAI(model="gpt-3.5-turbo-0125", temperature=0)
+        # reflect_model = "gpt-4-0125-preview"
+        reflect_model = "gpt-3.5-turbo-0125"
         reflect_parser = PydanticOutputParser(pydantic_object=ReflectionOuput)
         reflect_prompt = ChatPromptTemplate.from_messages(
             messages=[
@@ -206,24 +248,35 @@ class InformationExtractor:
                 ("human", """Review the parsed object: ```{parsed_object}``` and provide your recommendations. Format your response based on this format instructions: {format_instructions}""")
             ]
         )
-        chain = reflect_prompt | reflect_llm | reflect_parser
         input = {
             "format_instructions": reflect_parser.get_format_instructions(),
             "parsed_object": state['parsed_object'].json()
         }
-        response = chain.invoke(input)
-        print(f"reflect_response: {response}")
-
-        review = response.review
-        recommendations = response.recommendations
-        feedback = response.feedback
-        
-        if feedback == 'perfect':
-            reflection_status = 'completed'
-        else:
-            reflection_status = 'needs work'
+        started = time.time()
+        with span("reflect", model=reflect_model, attempt=state['num_validation_attempts']) as current:
+            try:
+                message = self._invoke_llm(state, reflect_model, input, prompt=reflect_prompt)
+            except Exception:
+                if not self._out_of_time(state, "reflect"):
+                    raise
+                # the validated object is kept as the result
+                current.set(outcome="timeout")
+                return {"timed_out": True}
+            current.record_tokens(message)
+            response = reflect_parser.parse(message.content)
+            logger.debug("reflect_response: %s", response)
+
+            review = response.review
+            recommendations = response.recommendations
+            feedback = response.feedback
+
+            if feedback == 'perfect':
+                reflection_status = 'completed'
+            else:
+                reflection_status = 'needs work'
+            current.set(outcome=reflection_status)
         human_message = HumanMessage(content=f"Review:\n{review}\nRecommendations: {recommendations}", type="human")
-        return {"messages": [human_message], "reflection_status": reflection_status}
+        return {"messages": [human_message], "reflection_status": reflection_status, **self._usage(state, "reflect", message, started)}
 
 
     def _should_generate(self, state: AgentState) -> str:
@@ -236,32 +289,26 @@ class InformationExtractor:
         Returns:
             str: next action to take ("end", "generate", or "reflect").
         """
-        print("** should_generate **")
         num_validation_attempts = state['num_validation_attempts']
         validation_status = state["validation_status"]
         reflection_status = state["reflection_status"]
         max_validation_attempts = state["max_validation_attempts"]
 
-        print(f"num_validation_attempts: {num_validation_attempts}")
-        print(f"validation_status: {validation_status}")
-        print(f"reflection_status: {reflection_status}")
-        print(f"max_validation_attempts: {max_validation_attempts}")
-
         if num_validation_attempts >= max_validation_attempts:
-            print("attempts exceeded max_attempts")
-            print("-- finish | E N D --")
+            logger.info("attempts exceeded max_attempts (%s)", max_validation_attempts)
             return "end"
 
         if validation_status == 'pass':
             if reflection_status == 'completed':
-                print("-- finish | E N D --")
                 return "end"
-            else:
-                print("-- reflect --")
-                return "reflect"
+            next_node = "reflect"
+        else:
+            next_node = "generate"
 
-        print("-- generate --")
-        return "generate"
+        if self._budget_exhausted(state, next_node):
+            logger.info("budget exhausted after %s attempts", num_validation_attempts)
+            return "end"
+        return next_node
 
 
     def _should_end(self, state: AgentState) -> str:
@@ -274,41 +321,260 @@ class InformationExtractor:
         Returns:
             str: next action to take ("end" or "generate").
         """
-        print("** should_end **")
-        num_validation_attempts = state['num_validation_attempts']
-        validation_status = state["validation_status"]
         reflection_status = state["reflection_status"]
-        max_validation_attempts = state["max_validation_attempts"]
-
-        print(f"num_validation_attempts: {num_validation_attempts}")
-        print(f"validation_status: {validation_status}")
-        print(f"reflection_status: {reflection_status}")
-        print(f"max_validation_attempts: {max_validation_attempts}")
 
-        if reflection_status == "needs work":
-            print("-- generate --")
+        if reflection_status == "needs work" and not self._budget_exhausted(state, "generate"):
             return "generate"
 
-        print("-- finish | E N D --")
         return "end"
 
 
-    def extract_information(self, text: str) -> Union[BaseModel, None]:
+    def _invoke_llm(self, state: AgentState, model: str, input: Any, prompt: ChatPromptTemplate = None) -> Any:
+        """
+        Invokes a chat model, bounded by the deadline when there is one.
+
+        Each try may take all the time left before the deadline. Rate limits, connection errors
+        and server errors are retried at most MAX_RETRIES times, and only while at least
+        MIN_RETRY_SECONDS are left, so a slow first try is never cut short to make room for retries.
+
+        Args:
+            state (AgentState): current state of the agent.
+            model (str): OpenAI model name.
+            input (Any): messages for the model, or the prompt input when a prompt is given.
+            prompt (ChatPromptTemplate, optional): prompt piped into the model.
+
+        Returns:
+            AIMessage: LLM response.
+        """
+        import openai
+        from langchain_openai import ChatOpenAI
+        if not state.get("deadline"):
+            llm = ChatOpenAI(model=model, temperature=0)
+            return (prompt | llm if prompt is not None else llm).invoke(input)
+
+        retries = 0
+        while True:
+            remaining = max(1.0, state["deadline"] - time.time())
+            llm = ChatOpenAI(model=model, temperature=0, timeout=remaining, max_retries=0)
+            try:
+                return (prompt | llm if prompt is not None else llm).invoke(input)
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as error:
+                if retries >= MAX_RETRIES or state["deadline"] - time.time() < MIN_RETRY_SECONDS:
+                    raise
+                retries += 1
+                logger.warning("Retrying %s after %s (%d of %d)", model, type(error).__name__, retries, MAX_RETRIES)
+                time.sleep(0.5 * 2 ** (retries - 1))
+
+
+    def _usage(self, state: AgentState, node: str, message: Any, started: float) -> Dict[str, Any]:
+        """
+        Accounts for the time and tokens spent on an LLM round.
+
+        Args:
+            state (AgentState): current state of the agent.
+            node (str): "generate" or "reflect".
+            message (AIMessage): LLM response.
+            started (float): time the round started.
+
+        Returns:
+            Dict[str, Any]: dictionary containing the updated budget state.
+        """
+        tokens = sum(token_usage(message))
+        round_seconds = dict(state.get("round_seconds") or {})
+        round_tokens = dict(state.get("round_tokens") or {})
+        round_seconds[node] = max(round_seconds.get(node, 0.0), time.time() - started)
+        round_tokens[node] = max(round_tokens.get(node, 0), tokens)
+        return {
+            "tokens_used": (state.get("tokens_used") or 0) + tokens,
+            "round_seconds": round_seconds,
+            "round_tokens": round_tokens
+        }
+
+
+    def _out_of_time(self, state: AgentState, node: str) -> bool:
+        """
+        Determines whether another round of a node would end after the deadline.
+
+        Args:
+            state (AgentState): current state of the agent.
+            node (str): "generate" or "reflect".
+
+        Returns:
+            bool: True if the deadline has passed or the slowest round of the node so far would overrun it.
+        """
+        deadline = state.get("deadline")
+        return bool(deadline) and time.time() + (state.get("round_seconds") or {}).get(node, 0.0) > deadline
+
+
+    def _out_of_tokens(self, state: AgentState, node: str) -> bool:
+        """
+        Determines whether another round of a node would exceed the token budget.
+
+        Args:
+            state (AgentState): current state of the agent.
+            node (str): "generate" or "reflect".
+
+        Returns:
+            bool: True if the largest round of the node so far would take tokens used over the budget.
+        """
+        token_budget = state.get("token_budget")
+        return bool(token_budget) and (state.get("tokens_used") or 0) + (state.get("round_tokens") or {}).get(node, 0) > token_budget
+
+
+    def _budget_exhausted(self, state: AgentState, node: str) -> bool:
+        """True if another round of the node does not fit in the remaining budget."""
+        return state.get("timed_out") or self._out_of_time(state, node) or self._out_of_tokens(state, node)
+
+
+    def _report(self, state: Dict[str, Any], started: float) -> ExtractionResult:
+        """
+        Picks the best available result and describes how complete it is.
+
+        Args:
+            state (Dict[str, Any]): final state of the workflow.
+            started (float): time the extraction started.
+
+        Returns:
+            ExtractionResult: validated object, or an unvalidated object built from the fields that
+                passed validation when no attempt validated as a whole, with a completeness report.
+        """
+        parsed_object = state.get("parsed_object")
+        partial_fields = state.get("partial_fields") or {}
+        if parsed_object is not None:
+            status = "complete" if state.get("reflection_status") == "completed" else "validated"
+        elif partial_fields:
+            fields = self.pydantic_class.__fields__
+            parsed_object = self.pydantic_class.construct(**dict((name, partial_fields.get(name)) for name in fields))
+            status = "partial"
+        else:
+            status = "empty"
+
+        if state.get("reflection_status") == "completed":
+            stop_reason = "completed"
+        elif state.get("num_validation_attempts", 0) >= state.get("max_validation_attempts", 0):
+            stop_reason = "max_attempts"
+        elif any(self._out_of_tokens(state, node) for node in ("generate", "reflect")):
+            stop_reason = "token_budget"
+        elif state.get("timed_out") or any(self._out_of_time(state, node) for node in ("generate", "reflect")):
+            stop_reason = "deadline"
+        else:
+            stop_reason = "completed"
+
+        present = []
+        if parsed_object is not None:
+            present = [name for name in self.pydantic_class.__fields__ if prune(getattr(parsed_object, name, None)) is not None]
+        report = {
+            "status": status,
+            "stop_reason": stop_reason,
+            "fields_present": present,
+            "fields_missing": [name for name in self.pydantic_class.__fields__ if name not in present],
+            "attempts": state.get("num_validation_attempts", 0),
+            "tokens_used": state.get("tokens_used", 0),
+            "elapsed_seconds": round(time.time() - started, 3)
+        }
+        return ExtractionResult(parsed_object, report)
+
+
+    def run_id(self, text: str) -> str:
+        """
+        Derives a run id from the document text and the pydantic class.
+
+        Args:
+            text (str): input text to extract information from.
+
+        Returns:
+            str: run id, stable for the same document and class.
+        """
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+        return f"{self.pydantic_class.__name__}-{digest}"
+
+
+    def extract_information(self, text: str, run_id: Union[str, None] = None) -> Union[BaseModel, None]:
         """
         Extracts information from the given text using the workflow.
 
+        With checkpointing enabled, an interrupted run resumes from the last completed node
+        and a completed run that produced a validated object returns it without calling the LLM.
+
         Args:
             text (str): input text to extract information from.
+            run_id (str, optional): id of the run to start or resume. Defaults to an id derived from text.
 
         Returns:
             Union[BaseModel, None]: parsed Pydantic object if successful, None otherwise.
         """
+        result = self.extract_information_with_report(text, run_id=run_id)
+        return result.parsed_object if result.report["status"] in ("complete", "validated") else None
+
+
+    def extract_information_with_report(self, text: str, run_id: Union[str, None] = None,
+                                        deadline_seconds: Union[float, None] = None,
+                                        token_budget: Union[int, None] = None) -> ExtractionResult:
+        """
+        Extracts information from the given text within an optional time and token budget.
+
+        When another generate or reflect round would overrun the budget, the workflow stops and
+        returns the best result so far: the last validated object or, if no attempt validated,
+        an object merged from the top-level fields that validated on their own.
+
+        Args:
+            text (str): input text to extract information from.
+            run_id (str, optional): id of the run to start or resume. Defaults to an id derived from text.
+            deadline_seconds (float, optional): wall-clock budget for the extraction.
+            token_budget (int, optional): budget of input plus output tokens for the extraction.
+
+        Returns:
+            ExtractionResult: best available object (None if nothing was extracted) and a completeness report
+                with status ('complete', 'validated', 'partial' or 'empty'), stop_reason, fields present and
+                missing, attempts, tokens used and elapsed seconds.
+        """
+        started = time.time()
+        budget = {
+            "deadline": started + deadline_seconds if deadline_seconds else None,
+            "token_budget": token_budget
+        }
         input = {
             "text": text,
-            "pydantic_class": self.pydantic_class,
             "messages": [],
             "num_validation_attempts": 0,
-            "max_validation_attempts": self.max_validation_attempts
+            "max_validation_attempts": self.max_validation_attempts,
+            "tokens_used": 0,
+            "round_seconds": {},
+            "round_tokens": {},
+            "timed_out": False,
+            "partial_fields": {},
+            **budget
         }
-        response = self.wf.invoke(input)
-        return response.get('parsed_object')
\ No newline at end of file
+        if self.checkpoints is None:
+            response = self.wf.invoke(input)
+            return self._report(response, started)
+
+        run_id = run_id or self.run_id(text)
+        config = {"configurable": {"thread_id": run_id}}
+        # sessions extracting the same document share its run, so wait for one running elsewhere
+        # and reuse its result rather than interleaving checkpoints
+        timeout = budget["deadline"] - time.time() if budget["deadline"] else None
+        if not self.checkpoints.wait_and_claim(run_id, timeout=timeout):
+            logger.info("run %s is still running elsewhere", run_id)
+            return self._report(dict(input, timed_out=True), started)
+        snapshot = self.wf.get_state(config)
+        if snapshot.values and not snapshot.next and self._report(snapshot.values, started).report["status"] not in ("complete", "validated"):
+            # only validated results are reused, runs that failed or were cut short by a budget start over
+            self.checkpoints.delete(run_id)
+            snapshot = self.wf.get_state(config)
+        self.checkpoints.start(run_id)
+        try:
+            if snapshot.values and not snapshot.next:
+                logger.info("run %s already completed", run_id)
+                response = snapshot.values
+            elif snapshot.values:
+                logger.info("resuming run %s before %s", run_id, snapshot.next)
+                self.wf.update_state(config, dict(budget, timed_out=False))
+                response = self.wf.invoke(None, config)
+            else:
+                response = self.wf.invoke(input, config)
+        except Exception:
+            self.checkpoints.finish(run_id, "failed")
+            raise
+        self.checkpoints.finish(run_id, "completed")
+        return self._report(response, started)
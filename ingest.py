@@ -0,0 +1,339 @@
+"""
+Watch-folder ingestion of resumes.
+
+Polls a drop folder for new files. Each file is copied into the runs folder under a content
+hash name and queued; worker threads stream queued files through loading, extraction and,
+optionally, assessment against a set of open job descriptions. The queue is bounded, so a
+burst of files pauses the watcher instead of piling up in memory, and the number of workers
+and documents started per minute bound the load on the LLM. Progress is recorded in SQLite,
+so after a restart finished files are skipped, and unfinished ones, as well as failed ones up to
+--max-attempts, are picked up again.
+
+Usage:
+    python ingest.py --watch data/inbox --jd-dir data/open_jds --workers 2 --queue-size 8
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import os
+import queue
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+
+from pipeline import DEFAULT_RUNS_DIR, extract_contents, hashed_filename
+from tracing import logger, span
+
+DEFAULT_INGEST_DB = "data/ingest.sqlite"
+DEFAULT_OUTPUT_DIR = "data/ingested"
+DEFAULT_MAX_ATTEMPTS = 3
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+
+
+class IngestStore:
+    """
+    SQLite record of ingested files by content hash
+    """
+    def __init__(self, path: str = DEFAULT_INGEST_DB):
+        """
+        Initializes IngestStore
+
+        Args:
+            path (str, optional): SQLite database file. Defaults to DEFAULT_INGEST_DB.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingested (
+                    content_hash TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    stored_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+
+
+    def status(self, content_hash: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM ingested WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row[0] if row else None
+
+
+    def record(self, content_hash: str, source: str, stored_path: str, status: str, error: Optional[str] = None) -> None:
+        """
+        Records the status of a file: 'queued', 'done' or 'failed'. Each 'failed' counts as an attempt.
+
+        Args:
+            content_hash (str): Hash of the file contents
+            source (str): Path the file was picked up from
+            stored_path (str): Path of the content hash named copy
+            status (str): New status
+            error (str, optional): Error message for failed files
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO ingested (content_hash, source, stored_path, status, error, updated_at, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(content_hash) DO UPDATE SET source = excluded.source, stored_path = excluded.stored_path, "
+                "status = excluded.status, error = excluded.error, updated_at = excluded.updated_at, "
+                "attempts = ingested.attempts + excluded.attempts",
+                (content_hash, source, stored_path, status, error, time.time(), 1 if status == "failed" else 0)
+            )
+
+
+    def pending(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[Tuple[str, str, str]]:
+        """
+        Lists files queued but not finished before the last shutdown, and failed files to retry
+
+        Args:
+            max_attempts (int, optional): Failed files are retried until they failed this many times. Defaults to DEFAULT_MAX_ATTEMPTS.
+
+        Returns:
+            List[Tuple[str, str, str]]: (content hash, source, stored path) per file
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT content_hash, source, stored_path FROM ingested "
+                "WHERE status = 'queued' OR (status = 'failed' AND attempts < ?) ORDER BY updated_at",
+                (max_attempts,)
+            ).fetchall()
+
+
+class RateLimiter:
+    """Spaces out document starts to at most `per_minute` per minute across workers"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self, stop: threading.Event) -> None:
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        stop.wait(start - now)
+
+
+class WatchFolderIngestor:
+    """
+    Watches a drop folder and streams new resumes through extraction and assessment
+    """
+    def __init__(self, watch_dir: str, jd_files: List[str], workers: int = 2, queue_size: int = 8,
+                 per_minute: float = 0.0, poll_interval: float = 2.0, assessment_model: str = "gpt_4",
+                 runs_dir: str = DEFAULT_RUNS_DIR, output_dir: str = DEFAULT_OUTPUT_DIR, store: Optional[IngestStore] = None,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Initializes WatchFolderIngestor
+
+        Args:
+            watch_dir (str): Drop folder to watch
+            jd_files (List[str]): Open job descriptions to assess each resume against. Empty to skip assessment.
+            workers (int, optional): Number of documents processed concurrently. Defaults to 2.
+            queue_size (int, optional): Maximum number of files waiting for a worker. Defaults to 8.
+            per_minute (float, optional): Maximum documents started per minute, 0 for no limit. Defaults to 0.
+            poll_interval (float, optional): Seconds between folder scans. Defaults to 2.
+            assessment_model (str, optional): Model used for assessment. Defaults to 'gpt_4'.
+            runs_dir (str, optional): Folder receiving content hash named copies. Defaults to DEFAULT_RUNS_DIR.
+            output_dir (str, optional): Folder receiving parsed resumes and assessments. Defaults to DEFAULT_OUTPUT_DIR.
+            store (IngestStore, optional): Progress store. Defaults to IngestStore().
+            max_attempts (int, optional): Failed files are retried on restart until they failed this many times. Defaults to DEFAULT_MAX_ATTEMPTS.
+        """
+        self.watch_dir = watch_dir
+        self.jd_files = jd_files
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.rate_limiter = RateLimiter(per_minute)
+        self.poll_interval = poll_interval
+        self.assessment_model = assessment_model
+        self.runs_dir = runs_dir
+        self.output_dir = output_dir
+        self.store = store or IngestStore()
+        self.max_attempts = max_attempts
+        self.stop = threading.Event()
+        self.jobs: Dict[str, object] = {}
+        # (size, mtime) per path from the previous scan; a file is picked up once it stops changing
+        self._sizes: Dict[str, Tuple[int, float]] = {}
+        self._seen: Dict[str, Tuple[int, float]] = {}
+
+
+    def _load_jobs(self) -> None:
+        """Parses the open job descriptions once, before any resume is processed"""
+        for jd_file in self.jd_files:
+            jd_content = extract_contents("jd", jd_file)
+            if jd_content is None:
+                logger.error("could not parse job description %s", jd_file)
+                continue
+            self.jobs[os.path.splitext(os.path.basename(jd_file))[0]] = jd_content
+
+
+    def _enqueue(self, item: Tuple[str, str, str]) -> bool:
+        """Blocks while the queue is full, so the watcher applies backpressure. Returns False when stopping."""
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+    def scan(self) -> None:
+        """Queues files in the drop folder that are new, supported and no longer being written"""
+        entries = [
+            entry for entry in sorted(os.scandir(self.watch_dir), key=lambda e: e.name)
+            if entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS)
+        ]
+        # forget files removed since the last scan
+        present = set(entry.path for entry in entries)
+        for path in [path for path in self._sizes if path not in present]:
+            del self._sizes[path]
+            self._seen.pop(path, None)
+
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            previous = self._sizes.get(entry.path)
+            self._sizes[entry.path] = signature
+            if previous != signature or self._seen.get(entry.path) == signature:
+                continue
+            self._seen[entry.path] = signature
+
+            try:
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            content_hash = hashlib.sha256(data).hexdigest()
+            if self.store.status(content_hash) is not None:
+                continue
+            os.makedirs(self.runs_dir, exist_ok=True)
+            stored_path = os.path.join(self.runs_dir, hashed_filename(data, entry.name))
+            shutil.copyfile(entry.path, stored_path)
+            self.store.record(content_hash, entry.path, stored_path, "queued")
+            if not self._enqueue((content_hash, entry.path, stored_path)):
+                return
+
+
+    def process(self, content_hash: str, source: str, stored_path: str) -> None:
+        """
+        Extracts a resume and assesses it against the open job descriptions
+
+        Args:
+            content_hash (str): Hash of the file contents
+            source (str): Path the file was picked up from
+            stored_path (str): Path of the content hash named copy
+        """
+        from assess import AssessResume
+        from encode import compact_encode
+
+        with span("ingest", source=os.path.basename(source), jobs=len(self.jobs)):
+            resume_content = extract_contents("resume", stored_path)
+            if resume_content is None:
+                raise ValueError("extraction returned no result")
+            output_dir = os.path.join(self.output_dir, content_hash)
+            os.makedirs(output_dir, exist_ok=True)
+            with open(os.path.join(output_dir, "resume.json"), "w") as f:
+                f.write(resume_content.json(indent=2))
+            for job_name, jd_content in self.jobs.items():
+                if self.stop.is_set():
+                    raise InterruptedError("stopping")
+                assessment = AssessResume(compact_encode(resume_content), compact_encode(jd_content), model_name=self.assessment_model)
+                with open(os.path.join(output_dir, f"assessment-{job_name}.md"), "w") as f:
+                    f.write(assessment.assess())
+
+
+    def _work(self) -> None:
+        while not self.stop.is_set():
+            try:
+                content_hash, source, stored_path = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.rate_limiter.wait(self.stop)
+                if self.stop.is_set():
+                    continue
+                self.process(content_hash, source, stored_path)
+                self.store.record(content_hash, source, stored_path, "done")
+                logger.info("ingested %s", source)
+            except InterruptedError:
+                pass  # left queued, picked up again after a restart
+            except Exception as e:
+                logger.error("failed to ingest %s: %s", source, e)
+                self.store.record(content_hash, source, stored_path, "failed", error=f"{type(e).__name__}: {e}")
+            finally:
+                self.queue.task_done()
+
+
+    def run(self, once: bool = False) -> None:
+        """
+        Runs the watcher and workers until stopped, or until the folder is drained when `once` is set
+
+        Args:
+            once (bool, optional): Process the files currently in the folder, then return. Defaults to False.
+        """
+        self._load_jobs()
+        threads = [threading.Thread(target=self._work, name=f"ingest-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for item in self.store.pending(self.max_attempts):
+            if not self._enqueue(item):
+                break
+        while not self.stop.is_set():
+            self.scan()
+            if once and not any(self._sizes[path] != self._seen.get(path) for path in self._sizes):
+                self.queue.join()
+                self.stop.set()
+                break
+            self.stop.wait(self.poll_interval)
+        for thread in threads:
+            thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watch", required=True, help="Drop folder to watch")
+    parser.add_argument("--jd-dir", help="Folder with open job descriptions to assess each resume against")
+    parser.add_argument("--workers", type=int, default=2, help="Documents processed concurrently")
+    parser.add_argument("--queue-size", type=int, default=8, help="Maximum files waiting for a worker")
+    parser.add_argument("--per-minute", type=float, default=0.0, help="Maximum documents started per minute, 0 for no limit")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between folder scans")
+    parser.add_argument("--model", default="gpt_4", help="Model used for assessment")
+    parser.add_argument("--db", default=DEFAULT_INGEST_DB, help="Progress database")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Folder for parsed resumes and assessments")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Retry failed files on restart until they failed this many times")
+    parser.add_argument("--once", action="store_true", help="Process the files currently in the folder and exit")
+    args = parser.parse_args()
+
+    jd_files = []
+    if args.jd_dir:
+        jd_files = sorted(
+            os.path.join(args.jd_dir, name) for name in os.listdir(args.jd_dir) if name.lower().endswith(SUPPORTED_EXTENSIONS)
+        )
+    ingestor = WatchFolderIngestor(
+        args.watch, jd_files, workers=args.workers, queue_size=args.queue_size, per_minute=args.per_minute,
+        poll_interval=args.poll_interval, assessment_model=args.model, output_dir=args.output_dir, store=IngestStore(args.db),
+        max_attempts=args.max_attempts
+    )
+    signal.signal(signal.SIGTERM, lambda *_: ingestor.stop.set())
+    try:
+        ingestor.run(once=args.once)
+    except KeyboardInterrupt:
+        ingestor.stop.set()
+
+
+if __name__ == "__main__":
+    main()
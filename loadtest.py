@@ -0,0 +1,262 @@
+"""
+Load test simulating concurrent screening sessions against a local stub LLM server.
+
+Each session follows the UI code path: save_file -> extract_for_assessment (extraction with
+the UI's deadline, near-duplicate detection and warehouse writes) -> AssessResume.assess. The stub server speaks the OpenAI chat completions API
+with configurable latency and error rate, so no real LLM is called.
+
+Usage:
+    python loadtest.py --sessions 50 --concurrency 10 --latency 0.5 --error-rate 0.02
+    python loadtest.py stub --port 8765 --latency 0.5     # run the stub server only
+"""
+from typing import Any, Dict, List
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_RESUME = {
+    "candidate": {"fullname": "Stub Candidate", "email": "stub@example.com"},
+    "candidate_summary": {"summary": "Data engineer with Java and SQL experience."},
+    "education": {"education": [{"school": "Stub University", "degree": "BS", "year_graduated": "2010"}]},
+    "skills": {"category": "Technical", "skills": [{"skill": "Java"}, {"skill": "SQL"}]},
+    "experience": {"experiences": [{"company": "Stub Corp", "role": "Engineer", "start_year": "2012", "end_year": "2020",
+                                    "tools_used": [{"tool_name": "Java"}]}]},
+    "training": {},
+    "certifications": {"Certitications": []},
+    "overall_summary": {"summary": "Stub Candidate is a data engineer."}
+}
+
+STUB_JD = {
+    "jobtitle": {"jobtitle": "Data Engineer"},
+    "mandatory_qualifications": {"mandatory_qualifications": [{"qualification": "5 years of Java"}]},
+    "professional_experience_with_tools": {"professional_tool_experiences": [{"tool": "Java", "number_of_years": 5, "mandatory": True}]},
+    "job_description_summary": {"summary": "Data engineer role requiring Java."}
+}
+
+STUB_REFLECTION = {"review": "Matches the format.", "recommendations": "None.", "feedback": "perfect"}
+
+STUB_ASSESSMENT = "## Assessment\n\nMandatory experience: 10/10\n\nRecommendation: proceed."
+
+
+def stub_reply(messages: List[Dict[str, Any]]) -> str:
+    """
+    Picks a canned reply for a chat completion request
+
+    Args:
+        messages (List[dict]): Request messages
+
+    Returns:
+        str: Reply content
+    """
+    last = str(messages[-1].get("content", "")) if messages else ""
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    if "Review the parsed object" in last:
+        return "```json\n" + json.dumps(STUB_REFLECTION) + "\n```"
+    if "FORMAT_INSTRUCTIONS" in prompt and "candidate_summary" in prompt:
+        return "```json\n" + json.dumps(STUB_RESUME) + "\n```"
+    if "FORMAT_INSTRUCTIONS" in prompt and "mandatory_qualifications" in prompt:
+        return "```json\n" + json.dumps(STUB_JD) + "\n```"
+    return STUB_ASSESSMENT
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI compatible chat completions endpoint with injected latency and errors"""
+    latency = 0.5
+    jitter = 0.2
+    error_rate = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(max(0.0, random.gauss(self.latency, self.latency * self.jitter)))
+        if random.random() < self.error_rate:
+            self._send(random.choice([429, 500]), {"error": {"message": "injected error", "type": "stub"}})
+            return
+        content = stub_reply(body.get("messages", []))
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        self._send(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4}
+        })
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_stub(port: int, latency: float, error_rate: float) -> None:
+    StubHandler.latency = latency
+    StubHandler.error_rate = error_rate
+    ThreadingHTTPServer(("127.0.0.1", port), StubHandler).serve_forever()
+
+
+def start_stub(latency: float, error_rate: float) -> subprocess.Popen:
+    """
+    Starts the stub server in a separate process, so it does not count towards the load test's threads and memory
+
+    Args:
+        latency (float): Mean response latency in seconds
+        error_rate (float): Share of requests answered with 429 or 500
+
+    Returns:
+        subprocess.Popen: Stub server process, with its port in the `port` attribute
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, __file__, "stub", "--port", str(port),
+                                "--latency", str(latency), "--error-rate", str(error_rate)])
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    process.port = port
+    return process
+
+
+class Upload(io.BytesIO):
+    """Stands in for streamlit's UploadedFile"""
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def run_session(session: int, workdir: str, assessment_model: str) -> float:
+    """
+    Runs one screening session through the UI code path
+
+    Args:
+        session (int): Session number, used to make documents unique
+        workdir (str): Directory for uploads, checkpoints, the near-duplicate index and the warehouse
+        assessment_model (str): Model used for the assessment
+
+    Returns:
+        float: End-to-end latency in seconds
+    """
+    from assess import AssessResume
+    from encode import compact_encode
+    from pipeline import save_file, extract_for_assessment
+
+    started = time.perf_counter()
+    runs_dir = os.path.join(workdir, "runs")
+    resume = Upload(f"resume-{session}.txt", f"Candidate {session}\nData engineer, Java since 2012.\n".encode())
+    jd = Upload(f"jd-{session}.txt", f"Job {session}\nData engineer, 5 years of Java.\n".encode())
+    resume_result, jd_result = extract_for_assessment(
+        save_file(resume, runs_dir), save_file(jd, runs_dir), checkpoint_db=os.path.join(workdir, "checkpoints.sqlite"),
+        dedup_db=os.path.join(workdir, "dedup.sqlite"), warehouse_root=os.path.join(workdir, "warehouse")
+    )
+    resume_content, jd_content = resume_result.parsed_object, jd_result.parsed_object
+    if resume_content is None or jd_content is None:
+        raise RuntimeError("extraction failed")
+    AssessResume(compact_encode(resume_content), compact_encode(jd_content), model_name=assessment_model).assess()
+    return time.perf_counter() - started
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "stub"])
+    parser.add_argument("--sessions", type=int, default=20, help="Total sessions to run")
+    parser.add_argument("--concurrency", type=int, default=5, help="Simultaneous sessions")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean stub LLM latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub LLM requests failing with 429/500")
+    parser.add_argument("--port", type=int, default=8765, help="Stub server port (stub command only)")
+    parser.add_argument("--llm-url", help="Use an already running OpenAI compatible server instead of starting the stub")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        serve_stub(args.port, args.latency, args.error_rate)
+        return
+
+    stub = None
+    if args.llm_url is None:
+        stub = start_stub(args.latency, args.error_rate)
+        args.llm_url = f"http://127.0.0.1:{stub.port}/v1"
+    os.environ.update({"OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "stub"),
+                       "OPENAI_BASE_URL": args.llm_url, "OPENAI_API_BASE": args.llm_url})
+
+    peak_threads = threading.active_count()
+    done = threading.Event()
+
+    def monitor():
+        nonlocal peak_threads
+        while not done.wait(0.05):
+            peak_threads = max(peak_threads, threading.active_count())
+
+    latencies, errors = [], []
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    threading.Thread(target=monitor, daemon=True).start()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(run_session, i, workdir, "gpt_35") for i in range(args.sessions)]
+            for future in futures:
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        if stub is not None:
+            stub.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "stub_latency": args.latency,
+        "stub_error_rate": args.error_rate,
+        "succeeded": len(latencies),
+        "failed": len(errors),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_minute": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+        "p50_seconds": round(statistics.median(latencies), 3) if latencies else None,
+        "p99_seconds": round(percentile(latencies, 99), 3) if latencies else None,
+        # ru_maxrss is reported in KB on linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_threads": peak_threads,
+        "errors": sorted(set(errors))[:10]
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:<24}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+from typing import Any, Callable, Optional, Tuple, Union
+import hashlib
+import os
+
+from checkpoints import DEFAULT_CHECKPOINT_DB
+from dedup import DEFAULT_DEDUP_DB, DuplicateIndex
+from entities import CompleteJobProfile, AllResumeContents
+from encode import prune
+from extract_data import ExtractionResult, InformationExtractor
+from tracing import logger
+from util import load_document_using_unstructured, content_hash
+
+DEFAULT_RUNS_DIR = "data/runs"
+# job descriptions are templated, so similar ones often differ in exactly the requirements that matter
+NEAR_DUPLICATE_TYPES = ("resume",)
+MAX_DIFF_LINES = 40
+
+
+def hashed_filename(data: bytes, name: str) -> str:
+    """
+    Names a file after the hash of its contents, keeping the extension of the original name
+
+    Args:
+    data (bytes): File contents
+    name (str): Original file name
+
+    Returns:
+    str: File name, so different files with the same name do not overwrite each other
+    """
+    return hashlib.sha256(data).hexdigest() + os.path.splitext(name)[1].lower()
+
+
+def save_file(uploaded_file: object, runs_dir: str = DEFAULT_RUNS_DIR) -> str:
+    """
+    Saves the uploaded files in a folder locally, named after the hash of their contents
+
+    Args:
+    uploaded_file(UploadedFile): The uploaded file object, with a name and getvalue()
+    runs_dir (str, optional): Folder to save to. Defaults to DEFAULT_RUNS_DIR.
+
+    Returns:
+    str: Path of the saved file
+    """
+    data = uploaded_file.getvalue()
+    filename = f"{runs_dir}/{hashed_filename(data, uploaded_file.name)}"
+    os.makedirs(runs_dir, exist_ok=True)
+    with open(filename, "wb") as f:
+        f.write(data)
+    return filename
+
+
+def extract_contents(content_type: str, filename: str, checkpoint_db: Union[str, None] = DEFAULT_CHECKPOINT_DB,
+                     dedup_db: Union[str, None] = DEFAULT_DEDUP_DB, dedup_threshold: Optional[float] = None,
+                     notify: Callable[[str], Any] = logger.info) -> Any:
+    """
+    Loads a document and extracts its contents, reusing the parsed contents of an identical document if there is one
+
+    Args:
+        content_type (str): 'resume' or 'jd'
+        filename (str): Path of the document
+        checkpoint_db (str, optional): Checkpoint database for the extraction workflow. None disables checkpointing.
+        dedup_db (str, optional): Duplicate index. None disables duplicate detection.
+        dedup_threshold (float, optional): Similarity threshold. Defaults to RESUME_DEDUP_THRESHOLD or 0.85.
+        notify (Callable, optional): Called with a message when a near-duplicate is found. Defaults to logging it.
+
+    Returns:
+        AllResumeContents or CompleteJobProfile: Parsed contents, None if extraction failed
+
+    Raises:
+        ValueError: If the content type is unsupported.
+    """
+    result = extract_contents_with_report(content_type, filename, checkpoint_db=checkpoint_db, dedup_db=dedup_db,
+                                          dedup_threshold=dedup_threshold, notify=notify)
+    return result.parsed_object if result.report["status"] in ("complete", "validated") else None
+
+
+def extract_contents_with_report(content_type: str, filename: str, checkpoint_db: Union[str, None] = DEFAULT_CHECKPOINT_DB,
+                                 dedup_db: Union[str, None] = DEFAULT_DEDUP_DB, dedup_threshold: Optional[float] = None,
+                                 notify: Callable[[str], Any] = logger.info, deadline_seconds: Optional[float] = None,
+                                 token_budget: Optional[int] = None) -> ExtractionResult:
+    """
+    Loads a document and extracts its contents within an optional time and token budget
+
+    Only a document with exactly the same text reuses the parsed contents stored in the duplicate
+    index. A near-duplicate of an earlier document (only resumes by default, see NEAR_DUPLICATE_TYPES)
+    is flagged with a diff against that document and extracted again, since a small edit can change
+    a date, a title or a requirement.
+
+    Args:
+        content_type (str): 'resume' or 'jd'
+        filename (str): Path of the document
+        checkpoint_db (str, optional): Checkpoint database for the extraction workflow. None disables checkpointing.
+        dedup_db (str, optional): Duplicate index. None disables duplicate detection.
+        dedup_threshold (float, optional): Similarity threshold. Defaults to RESUME_DEDUP_THRESHOLD or 0.85.
+        notify (Callable, optional): Called with a message when a near-duplicate is found or the result is partial. Defaults to logging it.
+        deadline_seconds (float, optional): Wall-clock budget for the extraction. Defaults to no deadline.
+        token_budget (int, optional): Token budget for the extraction. Defaults to no budget.
+
+    Returns:
+        ExtractionResult: Best available parsed contents and the extraction's completeness report
+
+    Raises:
+        ValueError: If the content type is unsupported.
+    """
+    if content_type == "resume":
+        pydantic_class = AllResumeContents
+    elif content_type == "jd":
+        pydantic_class = CompleteJobProfile
+    else:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    text = load_document_using_unstructured(fname=filename)
+
+    doc_id = content_hash(text)
+    index = None
+    indexed = False
+    near = None
+    if dedup_db:
+        if dedup_threshold is None:
+            dedup_threshold = float(os.environ.get("RESUME_DEDUP_THRESHOLD", "0.85"))
+        index = DuplicateIndex(dedup_db, threshold=dedup_threshold)
+        matches = index.query(text, content_type)
+        exact = next((m for m in matches if m.doc_id == doc_id), None)
+        if exact and exact.parsed:
+            notify(f"{os.path.basename(filename)} was parsed before; reusing its parsed contents.")
+            parsed_object = pydantic_class.parse_raw(exact.parsed)
+            present = [name for name in pydantic_class.__fields__ if prune(getattr(parsed_object, name)) is not None]
+            return ExtractionResult(parsed_object, {
+                "status": "validated", "stop_reason": "duplicate", "fields_present": present,
+                "fields_missing": [name for name in pydantic_class.__fields__ if name not in present],
+                "attempts": 0, "tokens_used": 0, "elapsed_seconds": 0.0
+            })
+        indexed = exact is not None
+        if content_type in NEAR_DUPLICATE_TYPES:
+            near = next((m for m in matches if m.doc_id != doc_id), None)
+        if near:
+            diff = index.diff(near.doc_id, text)
+            if len(diff) > MAX_DIFF_LINES:
+                diff = diff[:MAX_DIFF_LINES] + [f"... {len(diff) - MAX_DIFF_LINES} more lines"]
+            notify(f"{os.path.basename(filename)} is a near-duplicate ({near.similarity:.0%} similar) of a document parsed earlier; "
+                   "extracting it again. Changes:\n" + "\n".join(diff))
+
+    extractor = InformationExtractor(pydantic_class=pydantic_class, checkpoint_db=checkpoint_db)
+    result = extractor.extract_information_with_report(text, deadline_seconds=deadline_seconds, token_budget=token_budget)
+    validated = result.report["status"] in ("complete", "validated")
+    if near:
+        result.report.update(near_duplicate_of=near.doc_id, similarity=near.similarity)
+    if result.report["status"] == "partial":
+        notify(f"{os.path.basename(filename)} was only partially extracted ({result.report['stop_reason']}); "
+               f"missing {', '.join(result.report['fields_missing'])}.")
+    # partial results are not reused, a later run with more budget may complete them
+    if index is not None and not indexed:
+        index.add(doc_id, text, content_type, parsed=result.parsed_object.json() if validated else None)
+    elif index is not None and validated:
+        index.set_parsed(doc_id, result.parsed_object.json())
+    return result
+
+
+def extract_for_assessment(resume_filename: str, jd_filename: str, deadline_seconds: Optional[float] = None,
+                           checkpoint_db: Union[str, None] = DEFAULT_CHECKPOINT_DB, dedup_db: Union[str, None] = DEFAULT_DEDUP_DB,
+                           warehouse_root: Optional[str] = None, notify: Callable[[str], Any] = logger.info) -> Tuple[ExtractionResult, ExtractionResult]:
+    """
+    Extracts a resume and a job description for assessment, as the UI does, and stores validated results in the warehouse
+
+    Args:
+        resume_filename (str): Path of the resume
+        jd_filename (str): Path of the job description
+        deadline_seconds (float, optional): Wall-clock budget per document. Defaults to RESUME_EXTRACTION_DEADLINE or 120.
+        checkpoint_db (str, optional): Checkpoint database for the extraction workflow. None disables checkpointing.
+        dedup_db (str, optional): Near-duplicate index. None disables near-duplicate detection.
+        warehouse_root (str, optional): Warehouse directory. Defaults to the warehouse's default directory.
+        notify (Callable, optional): Called with a message when a near-duplicate is reused or a result is partial. Defaults to logging it.
+
+    Returns:
+        Tuple[ExtractionResult, ExtractionResult]: Resume and job description results
+    """
+    from warehouse import DEFAULT_WAREHOUSE_DIR, Warehouse
+
+    if deadline_seconds is None:
+        deadline_seconds = float(os.environ.get("RESUME_EXTRACTION_DEADLINE", "120"))
+    options = {"checkpoint_db": checkpoint_db, "dedup_db": dedup_db, "notify": notify, "deadline_seconds": deadline_seconds}
+    resume_result = extract_contents_with_report("resume", resume_filename, **options)
+    jd_result = extract_contents_with_report("jd", jd_filename, **options)
+
+    # partial results are shown but not stored, a later run may complete them
+    warehouse = Warehouse(warehouse_root or DEFAULT_WAREHOUSE_DIR)
+    if resume_result.report["status"] in ("complete", "validated"):
+        warehouse.add_candidate(resume_result.parsed_object)
+    if jd_result.report["status"] in ("complete", "validated"):
+        warehouse.add_job(jd_result.parsed_object)
+    return resume_result, jd_result
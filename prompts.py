@@ -16,4 +16,55 @@ assessment_template = dedent(
     Format your output using below format instructions:
     {format_instructions}
     """
-)
\ No newline at end of file
+)
+
+assessment_data_format = dedent(
+    """
+    Data Format:
+    - Job Description: Contains fields like job opportunity, required education, skills, certifications, mandatory and optional experience, and clearance requirements.
+    - Resume Content: Includes candidate contact information, location, skills, professional experience, tools used, certifications, training, education, and clearance status.
+    """
+)
+
+assessment_rubric = dedent(
+    """
+    Scoring Rubric:
+    1. Education: Score 5 if the candidate meets the education requirement, otherwise 0.
+    2. Mandatory Experience: Calculate score as (number of requirements met / total requirements) * 10.
+    3. Optional Experience: Calculate score as (number of optional items met / total optional items) * 5.
+    4. Tools: Score as (number of tools met / total tools listed) * 5.
+    5. Certifications: Score as (number of certifications met / total certifications listed) * 5.
+    6. Clearance: Score 5 if the candidate meets the clearance requirement, otherwise 0.
+    7. For categories not listed in the job description, assign the full score available for that category.
+    8. Sum the scores and convert the total to a percentage of 35.
+    9. If the information in the job description or resume is insufficient for a reliable assessment, note this in your summary.
+    10. Provide a detailed analysis for each category, the score obtained, and a final summary of the candidate's match to the job requirements. For each line item within the category, provide your reasoning on how the candidate matches or otherwise. Highlight if any mandatory requirements are not met, as this will disqualify the candidate.
+    11. Include your recommendation on whether to proceed with considering the candidate for the role.
+
+    Note: Ensure all calculations and data handling are done accurately, taking into account the structured nature of the data inputs.
+    """
+)
+
+resume_assessment_template = dedent(
+    """
+    You are a highly skilled resume sourcer with extensive experience in screening candidates for technology roles within the high-tech industry. You are provided with key information from a candidate's resume and a job description in a compact structured format, where nesting is shown by indentation. Your task is to assess the suitability of the resume for the role using a carefully designed rubric.
+    """
+) + assessment_data_format + dedent(
+    """
+    RESUME CONTENT: {resume_content}
+    JOB DESCRIPTION CONTENT: {job_content}
+    """
+) + assessment_rubric
+
+# rubric and job description first and resumes in the next message, so the prefix is identical across calls
+cached_assessment_template = dedent(
+    """
+    You are a highly skilled resume sourcer with extensive experience in screening candidates for technology roles within the high-tech industry. You are provided with key information from a job description below, followed by one or more candidate resumes in the next message, in a compact structured format, where nesting is shown by indentation. Your task is to assess the suitability of each resume for the role using a carefully designed rubric.
+    """
+) + assessment_data_format + assessment_rubric + dedent(
+    """
+    Assess every candidate independently. Start each candidate's assessment with a line of the form `### CANDIDATE: <candidate id>` using the id given with the resume.
+
+    JOB DESCRIPTION CONTENT: {job_content}
+    """
+)
@@ -0,0 +1,242 @@
+"""
+Lightweight tracing and metrics for pipeline stages.
+
+Every span updates in-process metrics, which are exposed in Prometheus text format by
+start_metrics_server. A sampled share of spans is also written as one JSON record per line
+to a local file and to the 'resume_assistant' logger at DEBUG level.
+
+Configuration (environment variables, or configure()):
+    RESUME_TRACE_SAMPLE_RATE: share of spans exported, 0.0 to 1.0. Defaults to 1.0.
+    RESUME_TRACE_FILE: JSONL file spans are appended to. Disabled if unset.
+    RESUME_METRICS_PORT: port for the Prometheus endpoint started by ui.py. Disabled if unset.
+"""
+from typing import Any, Dict, Optional, Tuple
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger("resume_assistant")
+
+LATENCY_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def token_usage(message: Any) -> Tuple[int, int]:
+    """
+    Reads input and output token counts from an LLM response
+
+    Args:
+        message (AIMessage): Response from the LLM
+
+    Returns:
+        Tuple[int, int]: (input tokens, output tokens), zeros if the provider did not report usage
+    """
+    usage = getattr(message, 'usage_metadata', None)
+    if usage:
+        return usage.get('input_tokens') or 0, usage.get('output_tokens') or 0
+    metadata = getattr(message, 'response_metadata', None) or {}
+    usage = metadata.get('token_usage') or metadata.get('usage') or {}
+    input_tokens = usage.get('prompt_tokens') or usage.get('input_tokens') or 0
+    output_tokens = usage.get('completion_tokens') or usage.get('output_tokens') or 0
+    return input_tokens, output_tokens
+
+
+class Span:
+    """A timed pipeline stage with attributes"""
+    __slots__ = ("name", "attributes", "started")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        """Sets span attributes, e.g. model, attempt or outcome"""
+        self.attributes.update(attributes)
+
+    def record_tokens(self, message: Any) -> None:
+        """
+        Adds token usage of an LLM response to the span
+
+        Args:
+            message (AIMessage): Response from the LLM
+        """
+        input_tokens, output_tokens = token_usage(message)
+        self.attributes["input_tokens"] = self.attributes.get("input_tokens", 0) + input_tokens
+        self.attributes["output_tokens"] = self.attributes.get("output_tokens", 0) + output_tokens
+
+
+class Metrics:
+    """Thread safe span counters, latency histograms and token counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans: Dict[Tuple[str, str], int] = {}
+        self.latency: Dict[str, list] = {}
+        self.tokens: Dict[Tuple[str, str, str], int] = {}
+
+    def observe(self, span: Span, latency: float) -> None:
+        """
+        Records a finished span
+
+        Args:
+            span (Span): Finished span
+            latency (float): Span latency in seconds
+        """
+        attributes = span.attributes
+        model = str(attributes.get("model", ""))
+        with self.lock:
+            key = (span.name, str(attributes.get("outcome", "")))
+            self.spans[key] = self.spans.get(key, 0) + 1
+            # bucket counts, followed by sum and count
+            histogram = self.latency.setdefault(span.name, [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    histogram[i] += 1
+            histogram[-2] += latency
+            histogram[-1] += 1
+            for direction in ["input", "output"]:
+                count = attributes.get(f"{direction}_tokens")
+                if count:
+                    key = (span.name, model, direction)
+                    self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def render(self) -> str:
+        """
+        Renders metrics in Prometheus text exposition format
+
+        Returns:
+            str: Metrics text
+        """
+        lines = [
+            "# HELP resume_span_total Finished pipeline spans by outcome",
+            "# TYPE resume_span_total counter"
+        ]
+        with self.lock:
+            for (name, outcome), count in sorted(self.spans.items()):
+                lines.append(f'resume_span_total{{span="{name}",outcome="{outcome}"}} {count}')
+            lines += [
+                "# HELP resume_span_latency_seconds Pipeline span latency",
+                "# TYPE resume_span_latency_seconds histogram"
+            ]
+            for name, histogram in sorted(self.latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f'resume_span_latency_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'resume_span_latency_seconds_bucket{{span="{name}",le="+Inf"}} {histogram[-1]}')
+                lines.append(f'resume_span_latency_seconds_sum{{span="{name}"}} {histogram[-2]:.6f}')
+                lines.append(f'resume_span_latency_seconds_count{{span="{name}"}} {histogram[-1]}')
+            lines += [
+                "# HELP resume_llm_tokens_total LLM tokens by span, model and direction",
+                "# TYPE resume_llm_tokens_total counter"
+            ]
+            for (name, model, direction), count in sorted(self.tokens.items()):
+                lines.append(f'resume_llm_tokens_total{{span="{name}",model="{model}",direction="{direction}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class JsonlExporter:
+    """Appends span records to a local JSONL file"""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", buffering=1)
+
+    def export(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+
+
+metrics = Metrics()
+_config = {
+    "sample_rate": float(os.environ.get("RESUME_TRACE_SAMPLE_RATE", "1.0")),
+    "exporter": JsonlExporter(os.environ["RESUME_TRACE_FILE"]) if os.environ.get("RESUME_TRACE_FILE") else None
+}
+_server = None
+_server_lock = threading.Lock()
+
+
+def configure(sample_rate: Optional[float] = None, jsonl_path: Optional[str] = None) -> None:
+    """
+    Configures span sampling and the JSONL exporter
+
+    Args:
+        sample_rate (float, optional): Share of spans exported, 0.0 to 1.0
+        jsonl_path (str, optional): JSONL file spans are appended to
+    """
+    if sample_rate is not None:
+        _config["sample_rate"] = sample_rate
+    if jsonl_path is not None:
+        _config["exporter"] = JsonlExporter(jsonl_path)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """
+    Times a pipeline stage. Exceptions mark the span with outcome 'error' and are re-raised.
+
+    Args:
+        name (str): Stage name, e.g. 'generate'
+        **attributes: Initial span attributes, e.g. model or attempt
+
+    Yields:
+        Span: Span to add attributes to
+    """
+    current = Span(name, attributes)
+    try:
+        yield current
+        current.attributes.setdefault("outcome", "ok")
+    except BaseException as e:
+        current.set(outcome="error", error=type(e).__name__)
+        raise
+    finally:
+        latency = time.perf_counter() - current.started
+        metrics.observe(current, latency)
+        if _config["sample_rate"] >= 1.0 or random.random() < _config["sample_rate"]:
+            record = {"span": name, "ts": time.time(), "latency": round(latency, 6), **current.attributes}
+            if _config["exporter"] is not None:
+                _config["exporter"].export(record)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("span %s", json.dumps(record, default=str))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves metrics at /metrics from a daemon thread. Only one server is started per process.
+
+    Args:
+        port (int): Port to listen on
+        host (str, optional): Interface to bind. Defaults to all interfaces.
+
+    Returns:
+        ThreadingHTTPServer: Running server
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
@@ -2,26 +2,7 @@ import streamlit as st
 from datetime import datetime
 import os
 import json
-from assess import AssessResume
-from extract_data import InformationExtractor
-from resume_entities import AllResumeContents
-from entities import CompleteJobProfile, AllResumeContents
-from util import load_document_using_unstructured
-
-
-def save_file(uploaded_file: object) -> None:
-    """
-    Saves the uploaded files in a folder locally
-    
-    Args:
-    uploaded_file(UploadedFile): The uploaded file object
-
-    Returns: None
-    """
-    filename = f"{runs_dir}/{uploaded_file.name}"
-    os.makedirs(runs_dir, exist_ok=True)
-    with open(filename, "wb") as f:
-        f.write(uploaded_file.getvalue())
+from tracing import start_metrics_server
 
 
 def display_contents(contents):
@@ -35,19 +16,6 @@ def display_contents(contents):
     st.text_area("Summary:", value=formatted_contents, height=400)
 
 
-def extract_contents(content_type, filename):
-    if content_type == "resume":
-        pydantic_class = AllResumeContents
-    elif content_type == "jd":
-        pydantic_class = CompleteJobProfile
-    else:
-        return ValueError
-    extractor = InformationExtractor(pydantic_class=pydantic_class)
-    text = load_document_using_unstructured(fname=filename)
-    # st.write(f"{content_type}:\n{text}")
-    return extractor.extract_information(text)
-
-
 def model_name_from_selection(model_selection: str) -> str:
     """
     Returns model name for a given model_selection
@@ -71,6 +39,9 @@ def model_name_from_selection(model_selection: str) -> str:
     return model_dict[model_selection]
 
 
+if os.environ.get("RESUME_METRICS_PORT"):
+    start_metrics_server(int(os.environ["RESUME_METRICS_PORT"]))
+
 st.set_page_config(
     page_title="Resume Assessment", 
     page_icon=":file_folder:", 
@@ -100,32 +71,47 @@ with st.sidebar:
 
 
 if kickoff and resume and jd:
+    from assess import AssessResume
+    from encode import compact_encode
+    from pipeline import save_file, extract_for_assessment
+
     st.session_state.resume = resume
     st.session_state.jd = jd
     # st.write(f"resume.name: {resume.name}")
     # st.write(f"jd.name: {jd.name}")
 
     runs_dir = f"data/runs"
-    st.session_state.resume_filename = f"{runs_dir}/{resume.name}"
-    st.session_state.jd_filename = f"{runs_dir}/{jd.name}"
-    save_file(resume)
-    save_file(jd)
-
-    resume_content = extract_contents("resume", st.session_state.resume_filename)    
-    jd_content = extract_contents("jd", st.session_state.jd_filename)
+    st.session_state.resume_filename = save_file(resume, runs_dir)
+    st.session_state.jd_filename = save_file(jd, runs_dir)
+
+    # each document's extraction is bounded by a deadline, a partial result is shown rather than none
+    resume_result, jd_result = extract_for_assessment(st.session_state.resume_filename, st.session_state.jd_filename, notify=st.info)
+    resume_content, jd_content = resume_result.parsed_object, jd_result.parsed_object
+    if resume_content is None or jd_content is None:
+        st.error("Could not extract the contents of the " + ("resume" if resume_content is None else "job description") + ". Please try again.")
+        st.stop()
     # st.write(f"jd_content: {jd_content}")
     # st.write(f"resume_content: {resume_content}")
     
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Resume")
-        display_contents(resume_content.overall_summary.summary)
+        display_contents(getattr(resume_content.overall_summary, "summary", None) or "No summary extracted.")
 
     with col2:
         st.subheader("Job Description")
-        display_contents(jd_content.job_description_summary.summary)
+        display_contents(getattr(jd_content.job_description_summary, "summary", None) or "No summary extracted.")
 
-    assessment = AssessResume(resume_content.dict(), jd_content.dict(), model_name=assessment_model_name)
+    assessment = AssessResume(compact_encode(resume_content), compact_encode(jd_content), model_name=assessment_model_name)
     assessment_response = assessment.assess()
     st.subheader("Assessment")
     st.markdown(assessment_response)
+
+    # verdicts are memoized per requirement, so after an edit to the job description only the
+    # changed requirements go back to the LLM
+    verdicts = assessment.assess_requirements(job_description=jd_content)
+    st.subheader("Requirements")
+    st.dataframe(
+        [{"category": v.category, "requirement": v.requirement, "met": v.met, "evidence": v.evidence} for v in verdicts],
+        use_container_width=True
+    )
@@ -1,11 +1,16 @@
-from typing import Union, Dict
+from typing import Union, Dict, Any, TYPE_CHECKING
 from collections import namedtuple
 from datetime import datetime
-from langchain_anthropic import ChatAnthropic
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
+from importlib import import_module
+import hashlib
 import io
-from pdf2docx import Converter
+import json
+import os
+from tracing import span, logger
+
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
 
 
 def datestamp() -> str:
@@ -28,6 +33,23 @@ def timestamp() -> str:
     return datetime.now().strftime("%Y%m%d%H%M%S")
 
 
+def content_hash(content: Union[str, Dict, Any]) -> str:
+    """
+    Computes a stable hash for parsed or raw document content
+
+    Args:
+        content (str, dict or BaseModel): Document content
+
+    Returns:
+        str: sha256 hex digest of the content
+    """
+    if hasattr(content, 'dict'):
+        content = content.dict()
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
 def read_content(jd: Union[str, io.BytesIO, None]) -> str:
     """
     Reads the contents of a job description file.
@@ -47,9 +69,10 @@ def read_content(jd: Union[str, io.BytesIO, None]) -> str:
         return ""
     
 
-def initialize_model(model_name:str) ->Union[ChatOpenAI, ChatAnthropic]:
+def initialize_model(model_name:str) ->Union['ChatOpenAI', 'ChatAnthropic']:
     """
     Initializes the appropriate language model based on the model name.
+    The provider package is imported on first use, only for the selected model.
 
     Args:
         model_name (str): The identifier for the model configuration.
@@ -60,17 +83,17 @@ def initialize_model(model_name:str) ->Union[ChatOpenAI, ChatAnthropic]:
     Raises:
         ValueError: If the model name is unsupported.
     """
-    ModelDetail = namedtuple('ModelDetail', ['model_name', 'model_class'])
+    ModelDetail = namedtuple('ModelDetail', ['model_name', 'module', 'model_class'])
 
     models: Dict[str, tuple] = {
-        'gpt_35': ModelDetail('gpt-3.5-turbo-0125', ChatOpenAI),
-        'gpt_4': ModelDetail('gpt-4-turbo-2024-04-09', ChatOpenAI),
-        'gpt_4o': ModelDetail('gpt-4o-2024-05-13', ChatOpenAI),
-        'gpt_4_0125': ModelDetail('gpt-4-0125-preview', ChatOpenAI),
-        'haiku': ModelDetail('claude-3-haiku-20240307', ChatAnthropic),
-        'sonnet': ModelDetail('claude-3-sonnet-20240229', ChatAnthropic),
-        'llama3': ModelDetail('llama3-70b-8192', ChatGroq),
-        'mistral': ModelDetail('mistral:instruct', ChatOpenAI)
+        'gpt_35': ModelDetail('gpt-3.5-turbo-0125', 'langchain_openai', 'ChatOpenAI'),
+        'gpt_4': ModelDetail('gpt-4-turbo-2024-04-09', 'langchain_openai', 'ChatOpenAI'),
+        'gpt_4o': ModelDetail('gpt-4o-2024-05-13', 'langchain_openai', 'ChatOpenAI'),
+        'gpt_4_0125': ModelDetail('gpt-4-0125-preview', 'langchain_openai', 'ChatOpenAI'),
+        'haiku': ModelDetail('claude-3-haiku-20240307', 'langchain_anthropic', 'ChatAnthropic'),
+        'sonnet': ModelDetail('claude-3-sonnet-20240229', 'langchain_anthropic', 'ChatAnthropic'),
+        'llama3': ModelDetail('llama3-70b-8192', 'langchain_groq', 'ChatGroq'),
+        'mistral': ModelDetail('mistral:instruct', 'langchain_openai', 'ChatOpenAI')
     }
 
     ollama_base_url = ""
@@ -79,7 +102,7 @@ def initialize_model(model_name:str) ->Union[ChatOpenAI, ChatAnthropic]:
     if model_name in models:
         model_detail = models[model_name]
         model_name = model_detail.model_name
-        model = model_detail.model_class
+        model = getattr(import_module(model_detail.module), model_detail.model_class)
         if model_name in ['llama3:instruct', 'mistral:instruct']:
             return model(
                 base_url=ollama_base_url, 
@@ -92,7 +115,6 @@ def initialize_model(model_name:str) ->Union[ChatOpenAI, ChatAnthropic]:
         raise ValueError("Unsupported model name")    
 
 
-from pdfminer.high_level import extract_text
 def extract_text_from_pdf(pdf_file: str) -> str:
     """
     Extracts text from pdf document
@@ -103,46 +125,48 @@ def extract_text_from_pdf(pdf_file: str) -> str:
     Returns:
         text (str): Returns text
     """
+    from pdfminer.high_level import extract_text
     text = extract_text(pdf_file)
     return text
 
 
-from langchain_community.document_loaders import UnstructuredPDFLoader
 def load_pdf_using_unstructured(pdf_file):
+    from langchain_community.document_loaders import UnstructuredPDFLoader
     loader = UnstructuredPDFLoader(pdf_file)
     data = loader.load()
     return data[0].page_content
 
 
-from langchain_community.document_loaders import UnstructuredWordDocumentLoader
 def load_docx_using_unstructured(docx):
+    from langchain_community.document_loaders import UnstructuredWordDocumentLoader
     loader = UnstructuredWordDocumentLoader(docx)
     docs = loader.load()
     return docs[0].page_content
 
 
-import os
 def load_document_using_unstructured(fname):
     ext = os.path.splitext(fname)[1].lower()
     # print(f"fname: {fname}")
     # print(f"ext: {ext}")
 
-    try:
-        if ext == '.pdf':
-            try:
-                text = load_pdf_using_unstructured(fname)
-            except KeyError as e:
-                print(f"KeyError encountered: {e}")
-                print("Trying other methods...")
-                text = extract_text_from_pdf(fname)
-        elif ext == '.docx':
-            text = load_docx_using_unstructured(fname)
-        elif ext == '.txt':
-            text = open(fname, 'r').read()
-        else:
-            raise NotImplementedError("The file extension is not supported.")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        raise  
+    with span("load_document", ext=ext) as current:
+        try:
+            if ext == '.pdf':
+                try:
+                    text = load_pdf_using_unstructured(fname)
+                except KeyError as e:
+                    logger.warning("KeyError encountered: %s. Trying other methods...", e)
+                    current.set(loader="pdfminer")
+                    text = extract_text_from_pdf(fname)
+            elif ext == '.docx':
+                text = load_docx_using_unstructured(fname)
+            elif ext == '.txt':
+                text = open(fname, 'r').read()
+            else:
+                raise NotImplementedError("The file extension is not supported.")
+        except Exception as e:
+            logger.error("An unexpected error occurred: %s", e)
+            raise
+        current.set(chars=len(text))
 
     return text
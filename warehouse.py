@@ -0,0 +1,580 @@
+"""
+Columnar warehouse of parsed resumes and job descriptions.
+
+Parsed AllResumeContents / CompleteJobProfile objects are flattened into Parquet tables
+(candidates, experiences, tools, certifications, job_requirements). Writes append a new part
+file per table, and once a table has COMPACT_PARTS part files they are compacted into one.
+Reads scan the part files through memory mapped pyarrow datasets with filters pushed down, so
+a large pool can be queried without loading it into memory.
+
+Usage:
+    python warehouse.py query --tool java:5 --clearance TS
+    python warehouse.py compact
+"""
+from typing import Any, Dict, List, Optional, Tuple, Union
+from datetime import datetime
+import argparse
+import os
+import re
+import threading
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from util import content_hash
+
+DEFAULT_WAREHOUSE_DIR = "data/warehouse"
+
+SCHEMAS = {
+    "candidates": pa.schema([
+        ("candidate_id", pa.string()), ("fullname", pa.string()), ("email", pa.string()), ("phone", pa.string()),
+        ("city", pa.string()), ("state", pa.string()), ("clearance_level", pa.int8()), ("total_years", pa.float64()),
+        ("summary", pa.string()), ("ingested_at", pa.timestamp("us"))
+    ]),
+    "experiences": pa.schema([
+        ("candidate_id", pa.string()), ("company", pa.string()), ("role", pa.string()), ("location", pa.string()),
+        ("start_year", pa.int32()), ("end_year", pa.int32()), ("current_job", pa.bool_()), ("years", pa.float64())
+    ]),
+    "tools": pa.schema([
+        ("candidate_id", pa.string()), ("tool", pa.string()), ("years", pa.float64())
+    ]),
+    "certifications": pa.schema([
+        ("candidate_id", pa.string()), ("certification_name", pa.string()), ("year_certified", pa.int32())
+    ]),
+    "job_requirements": pa.schema([
+        ("job_id", pa.string()), ("jobtitle", pa.string()), ("category", pa.string()), ("requirement", pa.string()),
+        ("tool", pa.string()), ("number_of_years", pa.int32()), ("mandatory", pa.bool_()),
+        ("clearance_level", pa.int8()), ("ingested_at", pa.timestamp("us"))
+    ]),
+}
+
+TABLES = list(SCHEMAS)
+# column identifying the document each row came from
+KEY_COLUMNS = {
+    "candidates": "candidate_id", "experiences": "candidate_id", "tools": "candidate_id",
+    "certifications": "candidate_id", "job_requirements": "job_id"
+}
+# part files per table that trigger a compaction after an append
+COMPACT_PARTS = 256
+
+# Warehouse instances over the same directory share a lock and the ids already stored,
+# so concurrent sessions in one process do not store a document twice
+_shared_lock = threading.Lock()
+_root_locks: Dict[str, threading.Lock] = {}
+_stored_ids: Dict[Tuple[str, str], set] = {}
+
+
+def _root_lock(root: str) -> threading.Lock:
+    with _shared_lock:
+        return _root_locks.setdefault(os.path.abspath(root), threading.Lock())
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+# clearance levels, ordered so a higher level satisfies a lower requirement
+CLEARANCE_LEVELS = {"secret": 1, "ts": 2, "ts/sci": 3}
+CLEARANCE_LEVEL = r'(ts\s*/\s*sci|top\s+secret(?:\s*/\s*sci)?|ts|secret)'
+# a level counts only next to a clearance word, so TypeScript's "TS" is not taken for Top Secret
+CLEARANCE_MENTION = re.compile(
+    rf'\b(?:clearance|cleared)(?:\s+(?:level|at|for|of|is))?\s*:?\s+(?:an?\s+)?{CLEARANCE_LEVEL}\b'
+    rf'|\b(?:active|current)\s+(ts\s*/\s*sci|top\s+secret(?:\s*/\s*sci)?|secret)\b'
+    rf'|\b{CLEARANCE_LEVEL}(?:\s+security)?\s+(?:clearance|cleared)\b',
+    re.IGNORECASE
+)
+CLEARANCE_FIELD = re.compile(rf'\b{CLEARANCE_LEVEL}\b', re.IGNORECASE)
+# "eligible for a TS clearance" or "able to obtain a Secret clearance" is not a clearance held
+CLEARANCE_NOT_HELD = re.compile(r'\b(eligib\w*|obtain\w*)\b', re.IGNORECASE)
+
+
+def _clearance_rank(level: str) -> int:
+    level = level.lower()
+    if "sci" in level:
+        return 3
+    if level.startswith("t"):
+        return 2
+    return 1
+
+
+def clearance_level(text: Optional[str], field: bool = False) -> int:
+    """
+    Detects the highest security clearance mentioned in text
+
+    Args:
+        text (str): Free text, e.g. a resume summary, or a clearance field
+        field (bool, optional): text is a clearance field, so a bare level such as "TS" counts. Defaults to False,
+            where a level counts only next to a word such as clearance, cleared, active or current, and not
+            when it is preceded by eligibility phrasing.
+
+    Returns:
+        int: 3 for TS/SCI, 2 for Top Secret, 1 for Secret, 0 if none is mentioned
+    """
+    if not text:
+        return 0
+    if field:
+        return max((_clearance_rank(m.group(1)) for m in CLEARANCE_FIELD.finditer(text)), default=0)
+    level = 0
+    for match in CLEARANCE_MENTION.finditer(text):
+        if CLEARANCE_NOT_HELD.search(text[max(0, match.start() - 40):match.start()]):
+            continue
+        mentioned = next(group for group in match.groups() if group)
+        level = max(level, _clearance_rank(mentioned))
+    return level
+
+
+def _to_int(value: Any) -> Optional[int]:
+    match = re.search(r'\d+', str(value)) if value is not None else None
+    return int(match.group()) if match else None
+
+
+def _to_month(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    name = str(value).strip().lower()[:3]
+    if name in MONTHS:
+        return MONTHS.index(name) + 1
+    month = _to_int(value)
+    return month if month and 1 <= month <= 12 else None
+
+
+def _experience_span(experience: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    Computes the months an experience covers, using the current month for current jobs
+
+    With only years known, 2015 - 2020 counts as 5 years, and a job starting and ending
+    in the same year counts as 0 years.
+
+    Args:
+        experience (dict): Experience from AllResumeContents
+
+    Returns:
+        Tuple[int, int]: Start and end as months since year 0, None when the start or end is unknown
+    """
+    start = _to_int(experience.get('start_year'))
+    end = _to_int(experience.get('end_year'))
+    end_month = _to_month(experience.get('end_month'))
+    if end is None and experience.get('current_job'):
+        end, end_month = datetime.now().year, datetime.now().month
+    if start is None or end is None or end < start:
+        return None
+    start_month = _to_month(experience.get('start_month')) or 1
+    end_month = end_month or start_month
+    return start * 12 + start_month, max(start * 12 + start_month, end * 12 + end_month)
+
+
+def _experience_years(experience: Dict[str, Any]) -> float:
+    """
+    Computes the duration of an experience in years
+
+    Args:
+        experience (dict): Experience from AllResumeContents
+
+    Returns:
+        float: Duration in years, 0.0 when the start year is unknown
+    """
+    span = _experience_span(experience)
+    return round((span[1] - span[0]) / 12, 2) if span else 0.0
+
+
+def _merged_years(spans: List[Tuple[int, int]]) -> float:
+    """
+    Computes the years covered by experiences, counting overlapping periods once
+
+    Args:
+        spans (List[Tuple[int, int]]): Experience spans from _experience_span
+
+    Returns:
+        float: Years covered
+    """
+    months, covered_until = 0, None
+    for start, end in sorted(spans):
+        if covered_until is not None:
+            start = max(start, covered_until)
+        if end > start:
+            months += end - start
+        covered_until = end if covered_until is None else max(covered_until, end)
+    return round(months / 12, 2)
+
+
+def _normalize_tool(name: Optional[str]) -> Optional[str]:
+    return re.sub(r'\s+', ' ', name).strip().lower() if name else None
+
+
+def flatten_resume(resume: Union[Dict, Any], candidate_id: str) -> Dict[str, pd.DataFrame]:
+    """
+    Flattens a parsed resume into warehouse rows
+
+    Args:
+        resume (dict or AllResumeContents): Parsed resume
+        candidate_id (str): Candidate id
+
+    Returns:
+        Dict[str, pd.DataFrame]: Rows per table
+    """
+    if hasattr(resume, 'dict'):
+        resume = resume.dict()
+    candidate = resume.get('candidate') or {}
+    address = candidate.get('address') or {}
+    experiences = [e for e in ((resume.get('experience') or {}).get('experiences') or []) if e]
+    certifications = [c for c in ((resume.get('certifications') or {}).get('Certitications') or []) if c]
+
+    experience_rows, tool_spans, spans = [], {}, []
+    for experience in experiences:
+        span = _experience_span(experience)
+        years = _experience_years(experience)
+        if span:
+            spans.append(span)
+        experience_rows.append({
+            "candidate_id": candidate_id,
+            "company": experience.get('company'),
+            "role": experience.get('role'),
+            "location": experience.get('location'),
+            "start_year": _to_int(experience.get('start_year')),
+            "end_year": _to_int(experience.get('end_year')),
+            "current_job": bool(experience.get('current_job')),
+            "years": years
+        })
+        for tool in set(_normalize_tool(t.get('tool_name')) for t in (experience.get('tools_used') or []) if t):
+            if tool:
+                tool_spans.setdefault(tool, [])
+                if span:
+                    tool_spans[tool].append(span)
+    # overlapping jobs using the same tool count once
+    tool_years = dict((tool, _merged_years(tool_spans[tool])) for tool in tool_spans)
+    for skill in ((resume.get('skills') or {}).get('skills') or []):
+        tool = _normalize_tool((skill or {}).get('skill'))
+        if tool:
+            tool_years.setdefault(tool, 0.0)
+
+    # the resume schema has no clearance field, so it is detected from the free text
+    text = " ".join(str(value) for value in [
+        (resume.get('candidate_summary') or {}).get('summary'),
+        (resume.get('overall_summary') or {}).get('summary'),
+        *[e.get('experience_detail') for e in experiences],
+        *[c.get('certification_name') for c in certifications]
+    ] if value)
+
+    ingested_at = datetime.now()
+    return {
+        "candidates": pd.DataFrame([{
+            "candidate_id": candidate_id,
+            "fullname": candidate.get('fullname'),
+            "email": candidate.get('email'),
+            "phone": candidate.get('phone'),
+            "city": address.get('city'),
+            "state": address.get('state'),
+            "clearance_level": clearance_level(text),
+            "total_years": _merged_years(spans),
+            "summary": (resume.get('overall_summary') or {}).get('summary'),
+            "ingested_at": ingested_at
+        }]),
+        "experiences": pd.DataFrame(experience_rows),
+        "tools": pd.DataFrame([
+            {"candidate_id": candidate_id, "tool": tool, "years": round(years, 2)} for tool, years in tool_years.items()
+        ]),
+        "certifications": pd.DataFrame([{
+            "candidate_id": candidate_id,
+            "certification_name": c.get('certification_name'),
+            "year_certified": _to_int(c.get('year_certified'))
+        } for c in certifications]),
+    }
+
+
+def flatten_job(job: Union[Dict, Any], job_id: str) -> Dict[str, pd.DataFrame]:
+    """
+    Flattens a parsed job description into warehouse rows
+
+    Args:
+        job (dict or CompleteJobProfile): Parsed job description
+        job_id (str): Job id
+
+    Returns:
+        Dict[str, pd.DataFrame]: Rows for the job_requirements table
+    """
+    if hasattr(job, 'dict'):
+        job = job.dict()
+    jobtitle = (job.get('jobtitle') or {}).get('jobtitle')
+    clearance = job.get('clearance_requirement') or {}
+    rows = []
+    for category in ['mandatory', 'optional']:
+        key = f"{category}_qualifications"
+        for item in ((job.get(key) or {}).get(key) or []):
+            if item and item.get('qualification'):
+                rows.append({"category": category, "requirement": item['qualification'], "tool": None,
+                             "number_of_years": None, "mandatory": category == 'mandatory'})
+    for item in ((job.get('professional_experience_with_tools') or {}).get('professional_tool_experiences') or []):
+        if item and item.get('tool'):
+            rows.append({"category": "tool", "requirement": item['tool'], "tool": _normalize_tool(item['tool']),
+                         "number_of_years": item.get('number_of_years'), "mandatory": item.get('mandatory')})
+    if clearance.get('clearance'):
+        rows.append({"category": "clearance", "requirement": clearance['clearance'], "tool": None,
+                     "number_of_years": None, "mandatory": True})
+
+    level = clearance_level(clearance.get('clearance'), field=True)
+    ingested_at = datetime.now()
+    for row in rows:
+        row.update({"job_id": job_id, "jobtitle": jobtitle, "clearance_level": level, "ingested_at": ingested_at})
+    return {"job_requirements": pd.DataFrame(rows)}
+
+
+class Warehouse:
+    """
+    Append-only Parquet store of parsed resumes and job descriptions
+    """
+    def __init__(self, root: str = DEFAULT_WAREHOUSE_DIR):
+        """
+        Initializes Warehouse
+
+        Args:
+            root (str, optional): Directory holding one sub-directory of part files per table.
+                Defaults to DEFAULT_WAREHOUSE_DIR.
+        """
+        self.root = root
+        self.filesystem = fs.LocalFileSystem(use_mmap=True)
+        self.lock = _root_lock(root)
+        for table in TABLES:
+            os.makedirs(os.path.join(root, table), exist_ok=True)
+
+
+    def _append(self, frames: Dict[str, pd.DataFrame]) -> None:
+        """
+        Writes one new part file per non-empty table
+
+        Part files are written under a hidden name and renamed when complete, so readers in other
+        processes or Warehouse instances never open a partly written file.
+
+        Args:
+            frames (Dict[str, pd.DataFrame]): Rows per table
+        """
+        for table, frame in frames.items():
+            if not frame.empty:
+                self._write_part(table, pa.Table.from_pandas(frame, schema=SCHEMAS[table], preserve_index=False))
+                if len(self._parts(table)) >= COMPACT_PARTS:
+                    self._compact(table)
+
+
+    def _write_part(self, table: str, data: pa.Table) -> str:
+        part = f"part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(self.root, table, part)
+        # datasets skip files starting with "."
+        temp_path = os.path.join(self.root, table, f".{part}.tmp")
+        pq.write_table(data, temp_path)
+        os.replace(temp_path, path)
+        return path
+
+
+    def _parts(self, table: str) -> List[str]:
+        """Part files of a table, oldest first"""
+        path = os.path.join(self.root, table)
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet"))
+
+
+    def _compact(self, table: str) -> int:
+        """
+        Rewrites the part files of a table as one, dropping documents stored more than once.
+        Must be called holding the lock.
+
+        Readers in other processes that listed the old part files before they were removed fail
+        and need to query again, so compact while the warehouse is not being queried elsewhere
+        when that matters.
+
+        Args:
+            table (str): Table name
+
+        Returns:
+            int: Number of part files replaced
+        """
+        parts = self._parts(table)
+        if len(parts) < 2:
+            return 0
+        key = KEY_COLUMNS[table]
+        seen, tables = set(), []
+        for part in parts:
+            data = pq.read_table(part, schema=SCHEMAS[table])
+            keys = data.column(key).to_pylist()
+            # keep the first stored copy of each document, duplicates come from other processes
+            keep = [k not in seen for k in keys]
+            seen.update(keys)
+            tables.append(data.filter(pa.array(keep, pa.bool_())))
+        self._write_part(table, pa.concat_tables(tables))
+        for part in parts:
+            os.remove(part)
+        return len(parts)
+
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Compacts every table into a single part file
+
+        Returns:
+            Dict[str, int]: Number of part files replaced per table
+        """
+        with self.lock:
+            return dict((table, self._compact(table)) for table in TABLES)
+
+
+    def dataset(self, table: str) -> Optional[ds.Dataset]:
+        """
+        Opens a memory mapped dataset over the part files of a table
+
+        Args:
+            table (str): Table name
+
+        Returns:
+            ds.Dataset: Dataset, None if the table has no rows yet
+        """
+        path = os.path.join(self.root, table)
+        if not any(name.endswith(".parquet") for name in os.listdir(path)):
+            return None
+        return ds.dataset(path, schema=SCHEMAS[table], format="parquet", filesystem=self.filesystem)
+
+
+    def contains(self, table: str, value: str) -> bool:
+        """
+        Checks whether a document is stored in a table, reading the table's ids once per process.
+        Must be called holding the lock.
+
+        Args:
+            table (str): Table name
+            value (str): Candidate or job id
+
+        Returns:
+            bool: True if stored
+        """
+        key = (os.path.abspath(self.root), table)
+        if key not in _stored_ids:
+            dataset = self.dataset(table)
+            column = KEY_COLUMNS[table]
+            _stored_ids[key] = set(dataset.to_table(columns=[column]).column(column).to_pylist()) if dataset else set()
+        return value in _stored_ids[key]
+
+
+    def _stored(self, table: str, value: str) -> None:
+        key = (os.path.abspath(self.root), table)
+        if key in _stored_ids:
+            _stored_ids[key].add(value)
+
+
+    def add_candidate(self, resume: Union[Dict, Any], candidate_id: Optional[str] = None) -> str:
+        """
+        Appends a parsed resume, unless the candidate is already stored
+
+        Args:
+            resume (dict or AllResumeContents): Parsed resume
+            candidate_id (str, optional): Candidate id. Defaults to the hash of the resume content.
+
+        Returns:
+            str: Candidate id
+        """
+        candidate_id = candidate_id or content_hash(resume)
+        with self.lock:
+            if not self.contains("candidates", candidate_id):
+                self._append(flatten_resume(resume, candidate_id))
+                self._stored("candidates", candidate_id)
+        return candidate_id
+
+
+    def add_job(self, job: Union[Dict, Any], job_id: Optional[str] = None) -> str:
+        """
+        Appends a parsed job description, unless the job is already stored
+
+        Args:
+            job (dict or CompleteJobProfile): Parsed job description
+            job_id (str, optional): Job id. Defaults to the hash of the job content.
+
+        Returns:
+            str: Job id
+        """
+        job_id = job_id or content_hash(job)
+        with self.lock:
+            if not self.contains("job_requirements", job_id):
+                self._append(flatten_job(job, job_id))
+                self._stored("job_requirements", job_id)
+        return job_id
+
+
+    def find_candidates(self, tools: Optional[Dict[str, float]] = None, clearance: Optional[str] = None,
+                        columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Finds candidates meeting minimum years per tool and a minimum clearance
+
+        Args:
+            tools (Dict[str, float], optional): Minimum years per tool, e.g. {"java": 5}
+            clearance (str, optional): Minimum clearance, one of 'Secret', 'TS', 'TS/SCI'
+            columns (List[str], optional): Candidate columns to return. Defaults to all.
+
+        Returns:
+            pd.DataFrame: Matching candidates
+        """
+        candidates = self.dataset("candidates")
+        if candidates is None:
+            return pd.DataFrame(columns=columns or [])
+
+        candidate_filter = None
+        if clearance:
+            candidate_filter = ds.field("clearance_level") >= CLEARANCE_LEVELS[clearance.strip().lower()]
+
+        if tools:
+            tool_dataset = self.dataset("tools")
+            if tool_dataset is None:
+                return pd.DataFrame(columns=columns or [])
+            matching = None
+            for tool, years in tools.items():
+                expression = (ds.field("tool") == _normalize_tool(tool)) & (ds.field("years") >= years)
+                ids = set(tool_dataset.to_table(columns=["candidate_id"], filter=expression).column("candidate_id").to_pylist())
+                matching = ids if matching is None else matching & ids
+            id_filter = ds.field("candidate_id").isin(pa.array(sorted(matching), pa.string()))
+            candidate_filter = id_filter if candidate_filter is None else candidate_filter & id_filter
+
+        # another process may have stored the same candidate, until compaction removes the copy
+        read_columns = columns if columns is None or "candidate_id" in columns else ["candidate_id"] + columns
+        result = candidates.to_table(columns=read_columns, filter=candidate_filter).to_pandas().drop_duplicates("candidate_id").reset_index(drop=True)
+        return result if read_columns == columns else result[columns]
+
+
+    def job_candidates(self, job_id: str) -> pd.DataFrame:
+        """
+        Finds candidates meeting the mandatory tool experience and clearance of a stored job
+
+        Args:
+            job_id (str): Job id
+
+        Returns:
+            pd.DataFrame: Matching candidates
+        """
+        requirements = self.dataset("job_requirements")
+        if requirements is None:
+            return pd.DataFrame()
+        rows = requirements.to_table(filter=ds.field("job_id") == job_id).to_pandas()
+        tools = dict(
+            (row.tool, row.number_of_years if pd.notna(row.number_of_years) else 0)
+            for row in rows.itertuples() if row.category == "tool" and (pd.isna(row.mandatory) or bool(row.mandatory))
+        )
+        level = int(rows["clearance_level"].max()) if not rows.empty else 0
+        clearance = dict((v, k) for k, v in CLEARANCE_LEVELS.items()).get(level)
+        return self.find_candidates(tools=tools, clearance=clearance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["query", "compact"])
+    parser.add_argument("--root", default=DEFAULT_WAREHOUSE_DIR, help="Warehouse directory")
+    parser.add_argument("--tool", action="append", default=[], help="tool:min_years, may be repeated")
+    parser.add_argument("--clearance", choices=["Secret", "TS", "TS/SCI"], help="Minimum clearance")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        for table, parts in Warehouse(args.root).compact().items():
+            print(f"{table}: {parts} part files compacted")
+        return
+
+    tools = dict((tool, float(years or 0)) for tool, _, years in (t.partition(":") for t in args.tool))
+    result = Warehouse(args.root).find_candidates(tools=tools, clearance=args.clearance,
+                                                  columns=["candidate_id", "fullname", "email", "clearance_level", "total_years"])
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()